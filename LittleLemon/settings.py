@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,12 +48,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'LittleLemonAPI.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'LittleLemonAPI.profiling.SamplingProfilerMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -95,6 +99,34 @@ DATABASES = {
     }
 }
 
+# Single-node SQLite profile for small locations. IMMEDIATE transactions take
+# the write lock up front, so concurrent checkouts queue on busy_timeout
+# instead of failing when a read transaction is upgraded to a write.
+# Enabled with LITTLELEMON_SQLITE=1 in the environment.
+USE_SQLITE = os.environ.get('LITTLELEMON_SQLITE') == '1'
+
+if USE_SQLITE:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': 5,
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Applied to every SQLite connection by LittleLemonAPI.sqlite.apply_pragmas
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -140,10 +172,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES' : [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'LittleLemonAPI.renderers.ColumnarJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES' : [
+        'rest_framework.parsers.JSONParser',
+        'LittleLemonAPI.renderers.ColumnarJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.ExpiringTokenAuthentication',
         #'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
@@ -156,8 +194,88 @@ REST_FRAMEWORK = {
     },
 }
 
+# The browsable API is an HTML renderer for development. With it disabled,
+# clients asking only for text/html get a cheap 406 instead of a rendered page.
+BROWSABLE_API = DEBUG
+
+if BROWSABLE_API:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('LittleLemonAPI.renderers.LazyBrowsableAPIRenderer')
+
+# MessagePack is only offered when the msgpack package is installed
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'LittleLemonAPI.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(1, 'LittleLemonAPI.renderers.MessagePackParser')
+
+# Per-process LRU for CachedTokenAuthentication, optionally backed by a shared
+# cache alias from CACHES. Timeouts are in seconds. Without SHARED_CACHE a token
+# revoked in one worker is still accepted by the others for up to LOCAL_TIMEOUT.
+# With it, revocations apply to every worker on their next request.
+TOKEN_AUTH_CACHE = {
+    'LOCAL_SIZE': 1024,
+    'LOCAL_TIMEOUT': 5,
+    'SHARED_CACHE': None,
+    'SHARED_TIMEOUT': 300,
+}
+
+# Lifetime of AuthToken keys in seconds. With SLIDING, active tokens have
+# their expiry pushed back instead of running out.
+EXPIRING_TOKEN = {
+    'TTL': 60 * 60 * 24 * 7,
+    'SLIDING': True,
+}
+
+# Responses smaller than this many bytes are sent uncompressed. Brotli is used
+# when installed and accepted by the client, gzip otherwise.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Cached cart listings, per user until their next cart write or a menu change.
+# CACHE is an alias from CACHES that every worker shares, e.g. Redis or
+# Memcached. A per-process cache would let workers serve listings of an old
+# menu, so listings are built from the database while it is None. TIMEOUT is
+# in seconds.
+CART_CACHE = {
+    'CACHE': None,
+    'TIMEOUT': 300,
+}
+
+# Where the published menu snapshots are written, and how many old versions
+# are kept for clients that still reference them
+MENU_SNAPSHOT_DIR = BASE_DIR / 'menu_snapshots'
+MENU_SNAPSHOT_KEEP = 5
+
+# Database task queue for order notifications, cart purges and menu snapshot
+# publishing, processed by `python manage.py runworker`. With EAGER, tasks run
+# in the request process after commit instead, which is the default under
+# DEBUG so runserver alone keeps the menu snapshot up to date.
+# LEASE and RETRY_DELAY are in seconds.
+TASK_QUEUE = {
+    'EAGER': DEBUG,
+    'LEASE': 300,
+    'RETRY_DELAY': 30,
+}
+
+# Receipts and order notifications are printed until a mail server is configured
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Opt-in sampling profiler. Profiles one in SAMPLE_RATE requests per view
+# (SAMPLE_RATES overrides it by view name, 0 disables sampling) and every
+# request with a signed HEADER from GET /api/profiler. Stats are aggregated
+# per WINDOW seconds in each worker process. GET /api/profiler answers with
+# the stats of the worker that served it and names that worker, run a single
+# worker while profiling to see all the samples in one place.
+PROFILER = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 100,
+    'SAMPLE_RATES': {},
+    'WINDOW': 300,
+    'HEADER': 'X-Profile',
+    'HEADER_MAX_AGE': 600,
+}
+
 DJOSER = {
     'USER_ID_FIELD' : "username",
+    'TOKEN_MODEL' : "LittleLemonAPI.models.AuthToken",
 }
 
 INTERNAL_IPS = [
@@ -165,3 +283,14 @@ INTERNAL_IPS = [
 ]
 
 APPEND_SLASH = False
+
+# How long a stored Idempotency-Key response can be replayed, in seconds
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Delivered orders older than this many days are moved to the archive tables
+# by the archiveorders command
+ORDER_ARCHIVE_DAYS = 90
+
+# Deleted menu items are only hidden. The purgemenuitems command removes the
+# ones deleted more than this many days ago that were never ordered.
+MENU_ITEM_PURGE_DAYS = 30
@@ -0,0 +1,45 @@
+"""
+Production settings for LittleLemon project.
+
+Imports the development settings and drops what a worker does not need:
+debug_toolbar, its middleware and __debug__/ URLs, and the browsable API.
+Select it with DJANGO_SETTINGS_MODULE=LittleLemon.settings_production and
+set DJANGO_SECRET_KEY in the environment. Check the effect with
+`python manage.py check_startup`.
+"""
+
+import os
+
+from .settings import *
+
+DEBUG = False
+
+# Required, the development key is public. It also signs the profiler header.
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host]
+
+DEVELOPMENT_APPS = ['debug_toolbar']
+DEVELOPMENT_MIDDLEWARE = ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEVELOPMENT_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DEVELOPMENT_MIDDLEWARE]
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
+
+INTERNAL_IPS = []
+
+# Tasks go to the queue, run `python manage.py runworker` next to the web workers
+TASK_QUEUE = dict(TASK_QUEUE, EAGER=False)
+
+# JSON-only responses, see BROWSABLE_API in settings.py
+BROWSABLE_API = False
+
+REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+    renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+    if renderer != 'LittleLemonAPI.renderers.LazyBrowsableAPIRenderer'
+]
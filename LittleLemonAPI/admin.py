@@ -1,9 +1,35 @@
 from django.contrib import admin
-from .models import MenuItem, Category, Cart, Order, OrderItem
+from .models import MenuItem, Category, Cart, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .cart import rebuild_summaries
+
+#admin edits bypass cart.py, so the affected summaries are rebuilt
+class CartAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        rebuild_summaries({obj.user_id, form.initial.get('user')} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_summaries([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_summaries(user_ids)
+
+#lists deleted menu items too, clearing is_active is how they are deleted
+class MenuItemAdmin(admin.ModelAdmin):
+    list_display = ['title', 'price', 'category', 'is_active']
+    list_filter = ['is_active']
+
+    def get_queryset(self, request):
+        return MenuItem.all_objects.select_related('category')
 
 # Register your models here.
-admin.site.register(MenuItem)
+admin.site.register(MenuItem, MenuItemAdmin)
 admin.site.register(Category)
-admin.site.register(Cart)
+admin.site.register(Cart, CartAdmin)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(ArchivedOrder)
+admin.site.register(ArchivedOrderItem)
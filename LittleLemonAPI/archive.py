@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import transaction
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+def archive_horizon() -> date:
+    #delivered orders dated before this day belong in the archive tables
+    return date.today() - timedelta(days=settings.ORDER_ARCHIVE_DAYS)
+
+def reaches_archive(start_date) -> bool:
+    if start_date is None:
+        return False
+    try:
+        return date.fromisoformat(start_date) < archive_horizon()
+    except ValueError:
+        return False
+
+def archive_batch(horizon: date, batch_size: int) -> int:
+    with transaction.atomic():
+        orders = list(Order.objects.select_for_update().filter(status=True, date__lt=horizon).order_by('pk')[:batch_size])
+        if not orders:
+            return 0
+
+        order_ids = [order.pk for order in orders]
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.pk, user_id=order.user_id, delivery_crew_id=order.delivery_crew_id,
+                status=order.status, total=order.total, date=order.date
+            )
+            for order in orders
+        ])
+        items = OrderItem.objects.filter(order_id__in=order_ids)
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order_id=item.order_id, menuitem_id=item.menuitem_id, menuitem_version_id=item.menuitem_version_id,
+                quantity=item.quantity, unit_price=item.unit_price, price=item.price
+            )
+            for item in items
+        ])
+        items.delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+        return len(orders)
+
+def archive_orders(batch_size: int = 1000, max_batches: int = None):
+    """
+    Moves delivered orders older than the archive horizon, with their items,
+    into the archive tables. Each batch is its own transaction, so an
+    interrupted run loses nothing and the next run carries on where it
+    stopped. Yields the number of orders moved per batch.
+    """
+    horizon = archive_horizon()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(horizon, batch_size)
+        if not moved:
+            return
+        batches += 1
+        yield moved
@@ -0,0 +1,204 @@
+import copy
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .caching import get_generations, bump_generation
+
+def get_config(name: str):
+    return settings.TOKEN_AUTH_CACHE[name]
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU with a per-entry timeout.
+    """
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (value, expires) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LRUCache(get_config('LOCAL_SIZE'), get_config('LOCAL_TIMEOUT'))
+
+GENERATION_KEY = 'tokenauth:generation'
+
+def get_shared_cache():
+    alias = get_config('SHARED_CACHE')
+    return caches[alias] if alias else None
+
+def shared_key(key: str) -> str:
+    return f"tokenauth:{key}"
+
+def user_generation_key(user_id: int) -> str:
+    return f"tokenauth:user:{user_id}"
+
+def current_generations(cache, user_id: int) -> tuple:
+    #the global generation is bumped by invalidate_all, the user's one by
+    #invalidate_user and invalidate_token
+    return get_generations(cache, [GENERATION_KEY, user_generation_key(user_id)])
+
+def attach_groups(user, group_names):
+    user._cached_group_names = frozenset(group_names)
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the resolved user, and the names of
+    their groups, in a bounded in-process LRU and optionally in a shared
+    Django cache. Entries are invalidated by the receivers in signals.py.
+
+    With a shared cache, every entry is checked against generations kept in
+    that cache, so an invalidation in one worker applies to all of them on
+    their next request. Without one, other workers keep accepting a revoked
+    token until their LRU entry expires, at most LOCAL_TIMEOUT seconds.
+    """
+    cache_namespace = 'token'
+
+    def get_cache_key(self, key: str) -> str:
+        return f"{self.cache_namespace}:{key}"
+
+    def lookup_token(self, key: str):
+        model = self.get_model()
+        try:
+            return model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    def check_token(self, token, key: str):
+        pass
+
+    def authenticate_credentials(self, key):
+        cache_key = self.get_cache_key(key)
+        cache = get_shared_cache()
+        entry = local_cache.get(cache_key)
+        if entry is None and cache is not None:
+            entry = cache.get(shared_key(cache_key))
+
+        if entry is not None and cache is not None and entry[3] != current_generations(cache, entry[0].pk):
+            #invalidated since it was cached, possibly by another worker
+            entry = None
+
+        if entry is None:
+            token = self.lookup_token(key)
+            user = token.user
+            group_names = tuple(user.groups.values_list('name', flat=True))
+            generations = current_generations(cache, user.pk) if cache is not None else None
+            entry = (user, token, group_names, generations)
+            if cache is not None:
+                cache.set(shared_key(cache_key), entry, get_config('SHARED_TIMEOUT'))
+        local_cache.set(cache_key, entry)
+
+        user, token, group_names, generations = entry
+        self.check_token(token, key)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        #each request gets its own copy so cached instances are never mutated
+        return (attach_groups(copy.copy(user), group_names), token)
+
+
+class ExpiringTokenAuthentication(CachedTokenAuthentication):
+    """
+    Authenticates AuthToken keys. The first PREFIX_LENGTH characters of the
+    key are a unique indexed lookup, the rest is only stored as a hash.
+    With EXPIRING_TOKEN['SLIDING'] the expiry is pushed back once less than
+    half of the TTL is left, so active tokens cost at most one write per
+    half TTL.
+    """
+    cache_namespace = 'authtoken'
+
+    def get_model(self):
+        from .models import AuthToken
+        return AuthToken
+
+    def get_cache_key(self, key: str) -> str:
+        return f"{self.cache_namespace}:{key[:self.get_model().PREFIX_LENGTH]}"
+
+    def lookup_token(self, key: str):
+        model = self.get_model()
+        if len(key) != model.KEY_LENGTH:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        try:
+            return model.objects.select_related('user').get(prefix=key[:model.PREFIX_LENGTH])
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    def check_token(self, token, key: str):
+        if not hmac.compare_digest(token.digest, token.hash_key(key)):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        now = timezone.now()
+        if token.expires_at <= now:
+            invalidate_token(self.get_cache_key(key), token.user_id)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        ttl = token.get_ttl()
+        if settings.EXPIRING_TOKEN['SLIDING'] and token.expires_at - now < ttl / 2:
+            token.expires_at = now + ttl
+            type(token).objects.filter(pk=token.pk).update(expires_at=token.expires_at)
+
+
+def invalidate_token(cache_key: str, user_id: int = None):
+    local_cache.delete(cache_key)
+    cache = get_shared_cache()
+    if cache is not None:
+        cache.delete(shared_key(cache_key))
+        if user_id is not None:
+            #drops the copies other workers hold in their LRU
+            bump_generation(cache, user_generation_key(user_id))
+
+def invalidate_user(user_id: int):
+    local_cache.delete_where(lambda entry: entry[0].pk == user_id)
+    cache = get_shared_cache()
+    if cache is not None:
+        bump_generation(cache, user_generation_key(user_id))
+
+def invalidate_all():
+    local_cache.clear()
+    cache = get_shared_cache()
+    if cache is not None:
+        bump_generation(cache, GENERATION_KEY)
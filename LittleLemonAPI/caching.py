@@ -0,0 +1,20 @@
+import time
+
+#Generation counters kept in a Django cache. Entries record the generations
+#they were built under and are dropped once one of them has moved on, which
+#invalidates any number of entries with a single write.
+
+def get_generations(cache, keys) -> tuple:
+    values = cache.get_many(keys)
+    #a missing counter starts from a fresh value, so entries built before it
+    #was evicted can never match it again
+    return tuple(values[key] if key in values else cache.get_or_set(key, time.time_ns(), None) for key in keys)
+
+def get_generation(cache, key: str):
+    return get_generations(cache, [key])[0]
+
+def bump_generation(cache, key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Sum
+from .caching import get_generation, bump_generation
+from .models import Cart, CartSummary, MenuItem, MenuItemVersion
+from .seralizers import CartSerializer
+
+GENERATION_KEY = 'cart:generation'
+
+def get_config(name: str):
+    return settings.CART_CACHE[name]
+
+def get_cache():
+    #listings are only cached in a cache shared by every worker, a menu change
+    #has to reach all of them
+    alias = get_config('CACHE')
+    return caches[alias] if alias else None
+
+def lock_summary(user_id: int) -> CartSummary:
+    """
+    Returns the user's CartSummary locked until the end of the transaction.
+    Every cart write takes this lock first, so the writes of one user are
+    serialized and the summary always matches their Cart rows.
+    """
+    return CartSummary.objects.select_for_update().get_or_create(user_id=user_id)[0]
+
+def get_summary(user) -> CartSummary:
+    return CartSummary.objects.filter(user=user).first() or CartSummary(user=user)
+
+def get_current_version(menuitem) -> MenuItemVersion:
+    if menuitem.current_version_id is None:
+        MenuItemVersion.objects.create_missing([menuitem.pk])
+        menuitem.current_version = MenuItem.all_objects.select_related('current_version').get(pk=menuitem.pk).current_version
+    return menuitem.current_version
+
+def add_item(user, menuitem, quantity: int) -> Cart:
+    """
+    Adds quantity of the menu item at the price of its current version. A
+    line added earlier is moved to the current version as a whole, so every
+    line is priced from the one version checkout records for it.
+    """
+    with transaction.atomic():
+        summary = lock_summary(user.pk)
+        version = get_current_version(menuitem)
+        cart_item, created = Cart.objects.get_or_create(
+            user=user, menuitem=menuitem,
+            defaults={'menuitem_version': version, 'quantity': quantity, 'unit_price': version.price, 'price': version.price * quantity}
+        )
+        if created:
+            added = cart_item.price
+        else:
+            previous = cart_item.price
+            cart_item.menuitem_version = version
+            cart_item.quantity += quantity
+            cart_item.unit_price = version.price
+            cart_item.price = version.price * cart_item.quantity
+            cart_item.save(update_fields=['menuitem_version', 'quantity', 'unit_price', 'price'])
+            added = cart_item.price - previous
+        CartSummary.objects.filter(pk=summary.pk).update(
+            item_count=F('item_count') + quantity, total=F('total') + added, version=F('version') + 1
+        )
+    return cart_item
+
+def clear_cart(user):
+    with transaction.atomic():
+        summary = lock_summary(user.pk)
+        Cart.objects.filter(user=user).delete()
+        CartSummary.objects.filter(pk=summary.pk).update(item_count=0, total=0, version=F('version') + 1)
+
+def recalculate_summary(user_id: int):
+    #callers hold the summary lock
+    totals = Cart.objects.filter(user_id=user_id).aggregate(item_count=Sum('quantity'), total=Sum('price'))
+    CartSummary.objects.filter(pk=user_id).update(
+        item_count=totals['item_count'] or 0, total=totals['total'] or 0, version=F('version') + 1
+    )
+
+def rebuild_summaries(user_ids):
+    #for Cart rows removed without going through this module, e.g. by a cascade
+    for user_id in user_ids:
+        with transaction.atomic():
+            lock_summary(user_id)
+            recalculate_summary(user_id)
+
+def remove_menu_items(user_id: int, menuitem_ids) -> int:
+    with transaction.atomic():
+        lock_summary(user_id)
+        removed = Cart.objects.filter(user_id=user_id, menuitem_id__in=menuitem_ids).delete()[0]
+        if removed:
+            recalculate_summary(user_id)
+    return removed
+
+def listing_key(cache, user_id: int, version: int) -> str:
+    #bumping the generation drops every cached listing at once
+    return f"cart:{get_generation(cache, GENERATION_KEY)}:{user_id}:{version}"
+
+def build_listing(user) -> list:
+    items = Cart.objects.filter(user=user).select_related('menuitem__category').order_by('pk')
+    return list(CartSerializer(items, many=True).data)
+
+def get_cart_listing(user) -> list:
+    """
+    The serialized Cart rows of the user. With a CART_CACHE alias the listing
+    is cached under the summary version, so the next cart write makes it
+    unreachable, and under a generation that invalidate_listings bumps when
+    the menu changes.
+    """
+    cache = get_cache()
+    if cache is None:
+        return build_listing(user)
+    key = listing_key(cache, user.pk, get_summary(user).version)
+    data = cache.get(key)
+    if data is None:
+        data = build_listing(user)
+        cache.set(key, data, get_config('TIMEOUT'))
+    return data
+
+def invalidate_listings():
+    cache = get_cache()
+    if cache is None:
+        return
+    #after commit, so no listing can be cached again from the old menu rows
+    transaction.on_commit(lambda: bump_generation(cache, GENERATION_KEY))
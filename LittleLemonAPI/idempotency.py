@@ -0,0 +1,102 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+KEY_MAX_LENGTH = 255
+
+def get_key_ttl() -> timedelta:
+    return timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+def hash_request(request) -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+def replay_response(record: IdempotencyKey) -> Response:
+    data = json.loads(record.response_body) if record.response_body else None
+    response = Response(data, status=record.response_status)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+def idempotent(view_method):
+    """
+    Makes a view method safe to retry with an Idempotency-Key header.
+
+    The key is stored per user together with a hash of the request and the
+    response it produced. A retry with the same key gets the stored response
+    back without running the view again. The key row is inserted before the
+    view runs and stays locked for the whole request, so concurrent
+    duplicates wait on the unique index for the first one to finish and then
+    replay its response.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+
+        if not key or len(key) > KEY_MAX_LENGTH:
+            return Response({"message": f"{IDEMPOTENCY_HEADER} must be between 1 and {KEY_MAX_LENGTH} characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hash_request(request)
+        now = timezone.now()
+
+        with transaction.atomic():
+            #insert first, a locking read of a missing row only takes gap locks on
+            #InnoDB and two first requests would deadlock on their INSERTs
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user, key=key, request_hash=request_hash, expires_at=now + get_key_ttl()
+                    )
+                created = True
+            except IntegrityError:
+                record = IdempotencyKey.objects.select_for_update().get(user=request.user, key=key)
+                created = False
+
+            if not created and record.expires_at <= now:
+                #expired keys are reused as if they were new
+                record.request_hash = request_hash
+                record.response_status = None
+                record.response_body = ''
+                record.expires_at = now + get_key_ttl()
+                created = True
+
+            if not created:
+                if record.request_hash != request_hash:
+                    return Response({"message": f"{IDEMPOTENCY_HEADER} was already used with a different request."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay_response(record)
+
+            response = view_method(self, request, *args, **kwargs)
+
+            if response.status_code >= 500:
+                #server errors are not stored so the client can retry them
+                record.delete()
+                return response
+
+            record.response_status = response.status_code
+            record.response_body = json.dumps(response.data, cls=JSONEncoder) if response.data is not None else ''
+            record.save()
+            return response
+
+    return wrapper
+
+def purge_expired_keys(batch_size: int = 1000) -> int:
+    deleted = 0
+    while True:
+        expired = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not expired:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=expired).delete()[0]
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.archive import archive_orders, archive_horizon
+
+
+class Command(BaseCommand):
+    help = 'Moves delivered orders older than ORDER_ARCHIVE_DAYS into the archive tables in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        archived = 0
+        for moved in archive_orders(batch_size=options['batch_size'], max_batches=options['max_batches']):
+            archived += moved
+            self.stdout.write(f"Archived {archived} orders so far.")
+        self.stdout.write(f"Archived {archived} orders dated before {archive_horizon()}.")
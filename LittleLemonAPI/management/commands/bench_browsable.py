@@ -0,0 +1,58 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from LittleLemonAPI.models import MenuItem
+from LittleLemonAPI.renderers import LazyBrowsableAPIRenderer
+from LittleLemonAPI.views import MenuItemsView, SingleMenuItemView, CategoryView
+
+
+class Command(BaseCommand):
+    help = 'Measures CPU time and queries per text/html request for each renderer stack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        item = MenuItem.objects.first()
+        if item is None:
+            raise CommandError('No menu items in the database, run seeddata first.')
+
+        stacks = {
+            'browsable': [JSONRenderer, BrowsableAPIRenderer],
+            'lazy browsable': [JSONRenderer, LazyBrowsableAPIRenderer],
+            'json only': [JSONRenderer],
+        }
+        endpoints = {
+            'menu-items': (MenuItemsView, '/api/menu-items', {}),
+            'menu-items/<pk>': (SingleMenuItemView, f'/api/menu-items/{item.pk}', {'pk': item.pk}),
+            'categories': (CategoryView, '/api/categories', {}),
+        }
+
+        #the superuser is rolled back at the end, it only makes the write forms visible
+        with transaction.atomic():
+            user = User.objects.create_superuser(username='bench-browsable-user')
+            factory = APIRequestFactory()
+
+            self.stdout.write(f"{'endpoint':<16} {'renderers':<15} {'status':>6} {'queries':>8} {'cpu ms':>8}")
+            for endpoint, (view_class, path, kwargs) in endpoints.items():
+                for name, renderers in stacks.items():
+                    view = view_class.as_view(renderer_classes=renderers, throttle_classes=[])
+                    status, queries, cpu = self.run(view, factory, user, path, kwargs, options['requests'])
+                    self.stdout.write(f"{endpoint:<16} {name:<15} {status:>6} {queries:>8.1f} {cpu:>8.2f}")
+
+            transaction.set_rollback(True)
+
+    def run(self, view, factory, user, path, kwargs, count):
+        with CaptureQueriesContext(connection) as context:
+            start = time.process_time()
+            for _ in range(count):
+                request = factory.get(path, HTTP_ACCEPT='text/html')
+                force_authenticate(request, user=user)
+                response = view(request, **kwargs)
+                response.render()
+            cpu = (time.process_time() - start) * 1000 / count
+        return response.status_code, len(context.captured_queries) / count, cpu
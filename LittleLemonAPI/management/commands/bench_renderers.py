@@ -0,0 +1,41 @@
+import gzip
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from LittleLemonAPI.models import MenuItem, Order
+from LittleLemonAPI.renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from LittleLemonAPI.middleware import brotli
+from LittleLemonAPI.seralizers import MenuItemSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares payload bytes and encode time of the API renderers for menu item and order pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        renderers = [JSONRenderer(), ColumnarJSONRenderer()]
+        if msgpack is not None:
+            renderers.append(MessagePackRenderer())
+
+        pages = {
+            'menu-items': lambda size: MenuItemSerializer(MenuItem.objects.select_related('category')[:size], many=True).data,
+            'orders': lambda size: OrderSerializer(Order.objects.all()[:size], many=True).data,
+        }
+
+        self.stdout.write(f"{'endpoint':<11} {'rows':>5} {'renderer':<22} {'bytes':>9} {'gzip':>8} {'br':>8} {'encode us':>10}")
+        for name, load in pages.items():
+            for size in options['page_sizes']:
+                data = load(size)
+                if len(data) < size:
+                    raise CommandError(f"Only {len(data)} {name} in the database, run seeddata first.")
+                for renderer in renderers:
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        body = renderer.render(data)
+                    encode = (time.perf_counter() - start) * 1e6 / options['repeat']
+                    compressed = len(gzip.compress(body))
+                    brotli_size = str(len(brotli.compress(body, quality=5))) if brotli is not None else '-'
+                    self.stdout.write(f"{name:<11} {size:>5} {type(renderer).__name__:<22} {len(body):>9} {compressed:>8} {brotli_size:>8} {encode:>10.1f}")
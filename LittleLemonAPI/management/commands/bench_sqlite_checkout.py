@@ -0,0 +1,85 @@
+import multiprocessing
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from LittleLemonAPI.models import MenuItem
+from LittleLemonAPI.views import CartView, OrderView
+
+USERNAME_PREFIX = 'bench_checkout_'
+
+#plain rollback journal with full syncs, SQLite's defaults
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+
+def checkout_worker(user_id, menuitem_id, checkouts, results):
+    connections.close_all()
+    user = User.objects.get(pk=user_id)
+    factory = APIRequestFactory()
+    cart_view = CartView.as_view(throttle_classes=[])
+    order_view = OrderView.as_view(throttle_classes=[])
+    done = failed = 0
+    for _ in range(checkouts):
+        try:
+            request = factory.post('/api/cart/menu-items', {'menuitem_id': menuitem_id, 'quantity': 1}, format='json')
+            force_authenticate(request, user=user)
+            cart_view(request)
+            request = factory.post('/api/orders')
+            force_authenticate(request, user=user)
+            response = order_view(request)
+            if response.status_code == 201:
+                done += 1
+            else:
+                failed += 1
+        except Exception:
+            failed += 1
+    connections.close_all()
+    results.put((done, failed))
+
+
+class Command(BaseCommand):
+    help = 'Measures checkout throughput on SQLite with several worker processes, with default and with SQLITE_PRAGMAS settings. Writes to and then cleans up the configured database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+        parser.add_argument('--checkouts', type=int, default=50, help='Checkouts per worker.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite, set LITTLELEMON_SQLITE=1 first.')
+        menuitem = MenuItem.objects.first()
+        if menuitem is None:
+            raise CommandError('No menu items in the database, run seeddata first.')
+
+        users = [User.objects.get_or_create(username=f"{USERNAME_PREFIX}{i}")[0] for i in range(max(options['workers']))]
+        from django.conf import settings
+        profiles = {'default': DEFAULT_PRAGMAS, 'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS}
+
+        self.stdout.write(f"{'pragmas':<15} {'workers':>7} {'checkouts':>9} {'failed':>6} {'seconds':>8} {'checkouts/s':>11}")
+        try:
+            for name, pragmas in profiles.items():
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    for workers in options['workers']:
+                        self.run(name, users[:workers], menuitem.pk, options['checkouts'])
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def run(self, name, users, menuitem_id, checkouts):
+        #children get fresh connections, which picks up the pragmas under test
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [context.Process(target=checkout_worker, args=(user.pk, menuitem_id, checkouts, results)) for user in users]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        done = sum(outcome[0] for outcome in outcomes)
+        failed = sum(outcome[1] for outcome in outcomes)
+        self.stdout.write(f"{name:<15} {len(users):>7} {done:>9} {failed:>6} {elapsed:>8.2f} {done / elapsed:>11.1f}")
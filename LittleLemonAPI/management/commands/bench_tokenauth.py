@@ -0,0 +1,48 @@
+import time
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from LittleLemonAPI import authentication
+from LittleLemonAPI.permissions import IsAdminOrManager
+
+
+class Command(BaseCommand):
+    help = 'Compares queries and time per request for TokenAuthentication and CachedTokenAuthentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        #everything created here is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench-tokenauth-user')
+            user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+            token = Token.objects.create(user=user)
+            authentication.local_cache.clear()
+
+            for auth_class in (TokenAuthentication, authentication.CachedTokenAuthentication):
+                queries, elapsed = self.run(auth_class(), token.key, options['requests'])
+                self.stdout.write(
+                    f"{auth_class.__name__:<28} {queries:>6} queries "
+                    f"({queries / options['requests']:.2f}/request), "
+                    f"{elapsed * 1e6 / options['requests']:.1f} us/request"
+                )
+
+            transaction.set_rollback(True)
+
+    def run(self, auth, key, count):
+        factory = RequestFactory()
+        permission = IsAdminOrManager()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for _ in range(count):
+                request = Request(factory.get('/api/orders', HTTP_AUTHORIZATION=f'Token {key}'))
+                request.user, request.auth = auth.authenticate(request)
+                permission.has_permission(request, None)
+            elapsed = time.perf_counter() - start
+        return len(context.captured_queries), elapsed
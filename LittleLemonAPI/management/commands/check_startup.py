@@ -0,0 +1,104 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PHASE_MARKER = 'check_startup phase: '
+
+#runs in a fresh interpreter so nothing is imported yet, timings go to stdout
+#and the phase markers go to stderr between the -X importtime lines
+WORKER_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+sys.stderr.write("%(marker)sboot\\n")
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+
+from django.conf import settings
+host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+path, _, query = sys.argv[1].partition('?')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+    'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'HTTP_ACCEPT': 'application/json',
+    'REMOTE_ADDR': '10.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1',
+    'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer, 'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+statuses = []
+sys.stderr.write("%(marker)srequest\\n")
+body = b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+responded = time.perf_counter()
+print(json.dumps({'boot': booted - start, 'request': responded - booted, 'status': statuses[0], 'modules': len(sys.modules)}))
+''' % {'marker': PHASE_MARKER}
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Sums the self time of -X importtime lines per top-level package and phase.
+    Returns {package: {phase: microseconds}}.
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+    phase = 'python'
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARKER):
+            phase = line[len(PHASE_MARKER):].strip()
+            continue
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]][phase] += int(self_time)
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Measures worker cold start: import time per package, app loading and time to the first response.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/menu-items', help='Path of the first request.')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to run, the median one is reported.')
+        parser.add_argument('--limit', type=int, default=20, help='Packages to list in the import breakdown.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        runs = []
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', WORKER_SCRIPT, options['path']],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall = time.perf_counter() - start
+            if result.returncode != 0:
+                tail = '\n'.join(line for line in result.stderr.splitlines() if not line.startswith('import time:'))[-2000:]
+                raise CommandError(f"Cold start failed:\n{tail}")
+            runs.append((wall, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr))
+
+        #the wall time includes interpreter startup and shutdown
+        runs.sort(key=lambda run: run[1]['boot'] + run[1]['request'])
+        wall, timings, stderr = runs[len(runs) // 2]
+        imports = parse_importtime(stderr)
+
+        self.stdout.write(f"settings             {settings.SETTINGS_MODULE}")
+        self.stdout.write(f"app loading          {timings['boot'] * 1000:8.1f} ms")
+        self.stdout.write(f"first request        {timings['request'] * 1000:8.1f} ms  GET {options['path']} -> {timings['status']}")
+        self.stdout.write(f"time to first byte   {(timings['boot'] + timings['request']) * 1000:8.1f} ms  (median of {len(runs)}, process wall {wall * 1000:.1f} ms)")
+        self.stdout.write(f"modules loaded       {timings['modules']:8}")
+        if len(runs) > 1:
+            spread = [(run[1]['boot'] + run[1]['request']) * 1000 for run in runs]
+            self.stdout.write(f"runs                 {' '.join(f'{value:.1f}' for value in spread)} ms (stdev {statistics.pstdev(spread):.1f})")
+
+        #-X importtime adds its own overhead, compare these numbers with each other only
+        phases = ['python', 'boot', 'request']
+        self.stdout.write('')
+        self.stdout.write(f"{'package':<28} {'startup ms':>10} {'boot ms':>10} {'request ms':>10} {'total ms':>10}")
+        ranked = sorted(imports.items(), key=lambda entry: sum(entry[1].values()), reverse=True)
+        for package, by_phase in ranked[:options['limit']]:
+            columns = ' '.join(f"{by_phase.get(phase, 0) / 1000:>10.1f}" for phase in phases)
+            self.stdout.write(f"{package:<28} {columns} {sum(by_phase.values()) / 1000:>10.1f}")
+        totals = ' '.join(f"{sum(by_phase.get(phase, 0) for by_phase in imports.values()) / 1000:>10.1f}" for phase in phases)
+        self.stdout.write(f"{'all imports':<28} {totals} {sum(sum(by_phase.values()) for by_phase in imports.values()) / 1000:>10.1f}")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from LittleLemonAPI.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired auth tokens in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            expired = list(AuthToken.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:options['batch_size']])
+            if not expired:
+                break
+            deleted += AuthToken.objects.filter(pk__in=expired).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired auth tokens.")
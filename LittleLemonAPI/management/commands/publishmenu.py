@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.menu_snapshot import publish_menu
+
+
+class Command(BaseCommand):
+    help = 'Publishes the current menu as a static snapshot, e.g. after bulk imports that send no signals.'
+
+    def handle(self, *args, **options):
+        pointer = publish_menu()
+        self.stdout.write(f"Published menu version {pointer['version']}.")
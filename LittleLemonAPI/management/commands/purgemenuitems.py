@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.menu_purge import purge_cart_rows, purge_menu_items, purge_horizon
+from LittleLemonAPI.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Removes deleted menu items from carts, then deletes the ones deleted before MENU_ITEM_PURGE_DAYS that were never ordered.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        deleted_ids = MenuItem.all_objects.filter(is_active=False).values_list('pk', flat=True)
+        removed = purge_cart_rows(list(deleted_ids), batch_size=options['batch_size'])
+        self.stdout.write(f"Removed {removed} cart rows of deleted menu items.")
+
+        horizon = purge_horizon()
+        purged = 0
+        for deleted in purge_menu_items(horizon, batch_size=options['batch_size'], max_batches=options['max_batches']):
+            purged += deleted
+            self.stdout.write(f"Purged {purged} menu items so far.")
+        self.stdout.write(f"Purged {purged} menu items deleted before {horizon}.")
@@ -0,0 +1,27 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from LittleLemonAPI import tasks  # registers the task functions
+from LittleLemonAPI.taskqueue import claim_batch, run_task
+
+
+class Command(BaseCommand):
+    help = 'Runs queued tasks with a local thread pool, no broker needed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                claimed = claim_batch(options['batch_size'])
+                if not claimed:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                results = list(pool.map(run_task, claimed))
+                self.stdout.write(f"Ran {len(results)} tasks, {results.count(False)} failed.")
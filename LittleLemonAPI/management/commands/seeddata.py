@@ -0,0 +1,199 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from LittleLemonAPI.models import MenuItem, MenuItemVersion, Category, Order, OrderItem, ArchivedOrder
+
+USERNAME_PREFIX = 'seed_user_'
+MENU_ITEM_SUFFIX = ' #'
+#rows are generated from one RNG per block, so the same seed produces the
+#same rows whatever the batch size and however many runs it took
+BLOCK_SIZE = 1000
+#a fixed default keeps the generated order dates independent of the day the command runs
+DEFAULT_END_DATE = date(2025, 1, 1)
+
+CATEGORIES = ['Appetizers', 'Salads', 'Soups', 'Mains', 'Pasta', 'Grill', 'Seafood', 'Vegetarian', 'Sides', 'Desserts', 'Drinks', 'Kids']
+ADJECTIVES = ['Lemon', 'Grilled', 'Roasted', 'Spicy', 'Smoked', 'Crispy', 'Greek', 'Herbed', 'Braised', 'Classic', 'Garden', 'Fresh']
+DISHES = ['Chicken', 'Salmon', 'Lamb', 'Feta Bowl', 'Risotto', 'Souvlaki', 'Falafel', 'Moussaka', 'Bruschetta', 'Baklava', 'Lemonade', 'Halloumi']
+
+
+def block_rows(seed, kind: str, start: int, stop: int, make_row):
+    """
+    Yields make_row(rng, index) for every index in [start, stop).
+    """
+    index = start
+    while index < stop:
+        block = index // BLOCK_SIZE
+        rng = random.Random(f"{seed}:{kind}:{block}")
+        #replay the skipped part of the block to keep the RNG in step
+        for skipped in range(block * BLOCK_SIZE, index):
+            make_row(rng, skipped)
+        block_stop = min(stop, (block + 1) * BLOCK_SIZE)
+        for row_index in range(index, block_stop):
+            yield make_row(rng, row_index)
+        index = block_stop
+
+def user_role(index: int):
+    if index % 50 == 0:
+        return 'Manager'
+    if index % 10 == 1:
+        return 'DeliveryCrew'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Tops the database up to the given number of deterministically generated users, menu items and orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', default='little-lemon')
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--menu-items', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--max-items-per-order', type=int, default=5)
+        parser.add_argument('--days', type=int, default=730, help='Orders are spread over this many days before --end-date.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=DEFAULT_END_DATE)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='lemon@123!')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+
+        self.seed_categories()
+        self.seed_users()
+        self.seed_menu_items()
+        self.seed_orders()
+
+    def report(self, label: str, created: int, elapsed: float):
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(f"{label:<12} {created:>10} rows in {elapsed:8.2f}s ({rate:,.0f} rows/s)")
+
+    def insert(self, label: str, rows, write_batch):
+        created = 0
+        start = time.perf_counter()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created += self.write(write_batch, batch)
+                batch = []
+        if batch:
+            created += self.write(write_batch, batch)
+        self.report(label, created, time.perf_counter() - start)
+
+    def write(self, write_batch, batch) -> int:
+        #one transaction per batch, an interrupted run resumes from the last committed batch
+        with transaction.atomic():
+            write_batch(batch)
+        return len(batch)
+
+    def next_pk(self, *models) -> int:
+        #after all the tables given, e.g. Order ids continue after archived ones
+        return max(model.objects.aggregate(Max('pk'))['pk__max'] or 0 for model in models) + 1
+
+    def reset_sequences(self, *models):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def seed_categories(self):
+        existing = set(Category.objects.filter(title__in=CATEGORIES).values_list('title', flat=True))
+        missing = [Category(title=title, slug=title.lower()) for title in CATEGORIES if title not in existing]
+        self.insert('categories', missing, Category.objects.bulk_create)
+
+    def seed_users(self):
+        groups = {name: Group.objects.get_or_create(name=name)[0] for name in ('Manager', 'DeliveryCrew')}
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        #hashing once keeps user creation from being dominated by the password hasher
+        password = make_password(self.options['password'])
+        first_pk = self.next_pk(User)
+
+        def make_row(rng, index):
+            return User(
+                pk=first_pk + index - start,
+                username=f"{USERNAME_PREFIX}{index}",
+                email=f"{USERNAME_PREFIX}{index}@example.com",
+                first_name=rng.choice(DISHES).split()[0],
+                password=password,
+            )
+
+        def write_batch(batch):
+            User.objects.bulk_create(batch)
+            memberships = []
+            for user in batch:
+                role = user_role(int(user.username[len(USERNAME_PREFIX):]))
+                if role:
+                    memberships.append(User.groups.through(user_id=user.pk, group_id=groups[role].pk))
+            User.groups.through.objects.bulk_create(memberships)
+
+        self.insert('users', block_rows(self.seed, 'users', start, self.options['users'], make_row), write_batch)
+        self.reset_sequences(User)
+
+    def seed_menu_items(self):
+        categories = list(Category.objects.filter(title__in=CATEGORIES).order_by('pk'))
+        #soft-deleted items keep their index, resuming must not reuse it
+        start = MenuItem.all_objects.filter(title__contains=MENU_ITEM_SUFFIX).count()
+
+        def make_row(rng, index):
+            return MenuItem(
+                title=f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}{MENU_ITEM_SUFFIX}{index}",
+                price=Decimal(rng.randrange(250, 4500)) / 100,
+                featured=rng.random() < 0.05,
+                category=categories[index % len(categories)],
+            )
+
+        self.insert('menu items', block_rows(self.seed, 'menuitems', start, self.options['menu_items'], make_row), MenuItem.objects.bulk_create)
+        #bulk_create skips MenuItem.save, which records the first version
+        MenuItemVersion.objects.create_missing()
+
+    def seed_orders(self):
+        seeded_users = User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk')
+        customers = list(seeded_users.filter(groups__isnull=True).values_list('pk', flat=True))
+        crew = list(seeded_users.filter(groups__name='DeliveryCrew').values_list('pk', flat=True))
+        menu_items = list(MenuItem.objects.filter(title__contains=MENU_ITEM_SUFFIX).order_by('pk').values_list('pk', 'price', 'current_version_id'))
+        if not customers or not menu_items:
+            raise CommandError('Orders need seeded customers and menu items.')
+
+        max_items = min(self.options['max_items_per_order'], len(menu_items))
+        end_date = self.options['end_date']
+        days = self.options['days']
+        #archived orders were seeded too, resuming must not create them again
+        start = sum(model.objects.filter(user__username__startswith=USERNAME_PREFIX).count() for model in (Order, ArchivedOrder))
+        first_pk = self.next_pk(Order, ArchivedOrder)
+
+        def make_row(rng, index):
+            order_pk = first_pk + index - start
+            items = []
+            for menuitem_pk, unit_price, version_pk in rng.sample(menu_items, rng.randint(1, max_items)):
+                quantity = rng.randint(1, 4)
+                items.append(OrderItem(
+                    order_id=order_pk, menuitem_id=menuitem_pk, menuitem_version_id=version_pk,
+                    quantity=quantity, unit_price=unit_price, price=unit_price * quantity,
+                ))
+
+            order_date = end_date - timedelta(days=rng.randrange(days))
+            #anything older than two days has been delivered
+            delivered = (end_date - order_date).days > 2 or rng.random() < 0.3
+            order = Order(
+                pk=order_pk,
+                user_id=rng.choice(customers),
+                delivery_crew_id=rng.choice(crew) if crew and (delivered or rng.random() < 0.5) else None,
+                status=delivered,
+                total=sum(item.price for item in items),
+                date=order_date,
+            )
+            return order, items
+
+        def write_batch(batch):
+            Order.objects.bulk_create([order for order, items in batch])
+            OrderItem.objects.bulk_create([item for order, items in batch for item in items], batch_size=self.batch_size)
+
+        self.insert('orders', block_rows(self.seed, 'orders', start, self.options['orders'], make_row), write_batch)
+        self.reset_sequences(Order)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from . import cart
+from .menu_snapshot import schedule_publish
+from .models import MenuItem, Cart, OrderItem, ArchivedOrderItem
+
+def purge_horizon():
+    #soft-deleted menu items deleted before this moment may be removed for good
+    return timezone.now() - timedelta(days=settings.MENU_ITEM_PURGE_DAYS)
+
+def soft_delete(menuitem_id: int) -> bool:
+    """
+    Hides a menu item with a single UPDATE, however many carts and order
+    lines refer to it. Order lines keep pointing at it and its versions,
+    cart rows are removed later by purge_cart_rows.
+    """
+    deleted = MenuItem.objects.filter(pk=menuitem_id).update(is_active=False, deleted_at=timezone.now())
+    if deleted:
+        #update() sends no post_save, see signals.menu_changed
+        schedule_publish()
+        cart.invalidate_listings()
+    return bool(deleted)
+
+def purge_cart_rows(menuitem_ids, batch_size: int = 1000) -> int:
+    """
+    Removes the Cart rows of the given menu items that are still deleted,
+    batch_size users at a time, one short transaction per user.
+    """
+    menuitem_ids = list(MenuItem.all_objects.filter(pk__in=menuitem_ids, is_active=False).values_list('pk', flat=True))
+    removed = 0
+    while menuitem_ids:
+        user_ids = list(Cart.objects.filter(menuitem_id__in=menuitem_ids).values_list('user_id', flat=True).distinct()[:batch_size])
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            removed += cart.remove_menu_items(user_id, menuitem_ids)
+    return removed
+
+def purge_menu_items(deleted_before=None, batch_size: int = 1000, max_batches: int = None):
+    """
+    Deletes menu items that were soft-deleted before deleted_before and were
+    never ordered, in batches. Items with order history stay soft-deleted.
+    Yields the number of items deleted per batch.
+    """
+    deleted_before = deleted_before or purge_horizon()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        menuitem_ids = list(
+            MenuItem.all_objects.filter(is_active=False, deleted_at__lt=deleted_before)
+            .exclude(Exists(OrderItem.objects.filter(menuitem=OuterRef('pk'))))
+            .exclude(Exists(ArchivedOrderItem.objects.filter(menuitem=OuterRef('pk'))))
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not menuitem_ids:
+            return
+        purge_cart_rows(menuitem_ids)
+        with transaction.atomic():
+            MenuItem.all_objects.filter(pk__in=menuitem_ids, is_active=False).delete()
+        batches += 1
+        yield len(menuitem_ids)
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from django.conf import settings
+from .models import MenuItem, Category
+from .seralizers import CategorySerializer
+from .taskqueue import task, enqueue
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+POINTER_NAME = 'menu-latest.json'
+VERSION_PATTERN = re.compile(r'[0-9a-f]{16}')
+
+#(encoding, file suffix, compress function), best first
+ENCODINGS = [('gzip', '.gz', lambda body: gzip.compress(body, mtime=0))]
+if brotli is not None:
+    ENCODINGS.insert(0, ('br', '.br', lambda body: brotli.compress(body, quality=11)))
+
+def get_snapshot_dir() -> Path:
+    return Path(settings.MENU_SNAPSHOT_DIR)
+
+def build_menu_document() -> dict:
+    items = MenuItem.objects.order_by('title').values('id', 'title', 'price', 'featured', 'category_id')
+    categories = {category.pk: dict(CategorySerializer(category).data, items=[]) for category in Category.objects.order_by('title')}
+    featured = []
+    for item in items:
+        entry = {'id': item['id'], 'title': item['title'], 'price': str(item['price']), 'featured': item['featured']}
+        categories[item['category_id']]['items'].append(entry)
+        if item['featured']:
+            featured.append(entry)
+    return {'categories': list(categories.values()), 'featured': featured}
+
+def write_atomic(path: Path, content: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(content)
+    os.replace(tmp_path, path)
+
+def read_pointer():
+    try:
+        return json.loads((get_snapshot_dir() / POINTER_NAME).read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def publish_menu() -> dict:
+    """
+    Renders the whole menu into a content-addressed menu-<hash>.json, with
+    pre-compressed variants next to it, and points menu-latest.json at it.
+    Publishing unchanged content only rewrites the pointer.
+    """
+    built_at = time.time()
+    body = json.dumps(build_menu_document(), separators=(',', ':')).encode()
+    content_hash = hashlib.sha256(body).hexdigest()[:16]
+
+    directory = get_snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"menu-{content_hash}.json"
+    if not (directory / name).exists():
+        for encoding, suffix, compress in ENCODINGS:
+            write_atomic(directory / (name + suffix), compress(body))
+        #the plain file goes last, its presence means the version is complete
+        write_atomic(directory / name, body)
+
+    pointer = {'version': content_hash, 'file': name, 'built_at': built_at}
+    current = read_pointer()
+    #a slower publisher must not replace a snapshot built from newer data
+    if current is None or current.get('built_at', 0) <= built_at:
+        write_atomic(directory / POINTER_NAME, json.dumps(pointer).encode())
+        prune_snapshots(keep={name, current and current.get('file')})
+    return pointer
+
+def prune_snapshots(keep: set):
+    directory = get_snapshot_dir()
+    versions = sorted(directory.glob('menu-*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+    versions = [path for path in versions if path.name != POINTER_NAME]
+    for path in versions[settings.MENU_SNAPSHOT_KEEP:]:
+        if path.name in keep:
+            continue
+        for variant in [path] + [Path(str(path) + suffix) for encoding, suffix, compress in ENCODINGS]:
+            variant.unlink(missing_ok=True)
+
+@task(coalesce=True)
+def publish_menu_snapshot():
+    publish_menu()
+
+def schedule_publish():
+    #publishing renders and compresses the whole menu, so it runs in the task
+    #worker. Every change queues a publish, a worker claiming one drops the
+    #others that are pending, and a rolled back transaction takes its row with it.
+    enqueue(publish_menu_snapshot)
+
+def get_snapshot_file(version: str = None):
+    """
+    Returns (version, path) for the given or the latest snapshot, or None.
+    """
+    if version is None:
+        pointer = read_pointer()
+        if pointer is None:
+            return None
+        version = pointer['version']
+    elif not VERSION_PATTERN.fullmatch(version):
+        return None
+    path = get_snapshot_dir() / f"menu-{version}.json"
+    return (version, path) if path.exists() else None
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses of at least COMPRESSION_MIN_SIZE bytes. Uses brotli
+    when it is installed and the client accepts it, gzip otherwise.
+
+    Brotli output gets none of the random padding GZipMiddleware adds
+    against BREACH, so HTML, the only place CSRF tokens are rendered (admin,
+    browsable API), always goes through gzip. API responses carry no CSRF
+    token and are authorized by a header a cross-site page cannot make the
+    browser send.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return super().process_response(request, response)
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        is_html = response.get("Content-Type", "").startswith("text/html")
+        if brotli is not None and not is_html and re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            patch_vary_headers(response, ("Accept-Encoding",))
+            compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+            #same as GZipMiddleware, a strong ETag no longer matches the encoded bytes
+            etag = response.get("ETag")
+            if etag and etag.startswith('"'):
+                response.headers["ETag"] = "W/" + etag
+            response.headers["Content-Encoding"] = "br"
+            return response
+
+        return super().process_response(request, response)
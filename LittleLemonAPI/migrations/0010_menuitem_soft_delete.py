@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    #order lines placed before versioning keep a null menuitem_version
+    MenuItem = apps.get_model('LittleLemonAPI', 'MenuItem')
+    MenuItemVersion = apps.get_model('LittleLemonAPI', 'MenuItemVersion')
+    for item in MenuItem.objects.filter(current_version__isnull=True).iterator(chunk_size=1000):
+        version = MenuItemVersion.objects.create(menuitem=item, title=item.title, price=item.price, category_id=item.category_id)
+        MenuItem.objects.filter(pk=item.pk).update(current_version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0009_cartsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedorderitem',
+            name='menuitem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='LittleLemonAPI.menuitem'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='menuitem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='LittleLemonAPI.menuitem'),
+        ),
+        migrations.CreateModel(
+            name='MenuItemVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='LittleLemonAPI.category')),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='LittleLemonAPI.menuitem')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='menuitem_version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_orderitem_set', to='LittleLemonAPI.menuitemversion'),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='current_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='LittleLemonAPI.menuitemversion'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='menuitem_version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='LittleLemonAPI.menuitemversion'),
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
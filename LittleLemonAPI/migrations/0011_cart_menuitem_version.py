@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_cart_versions(apps, schema_editor):
+    #cart rows keep the price they were added at, a row whose price no longer
+    #matches the item's current version gets a version recording that price
+    MenuItem = apps.get_model('LittleLemonAPI', 'MenuItem')
+    MenuItemVersion = apps.get_model('LittleLemonAPI', 'MenuItemVersion')
+    Cart = apps.get_model('LittleLemonAPI', 'Cart')
+    for item in MenuItem.objects.filter(current_version__isnull=True).iterator(chunk_size=1000):
+        version = MenuItemVersion.objects.create(menuitem=item, title=item.title, price=item.price, category_id=item.category_id)
+        MenuItem.objects.filter(pk=item.pk).update(current_version=version)
+    for cart_item in Cart.objects.select_related('menuitem__current_version').iterator(chunk_size=1000):
+        item = cart_item.menuitem
+        version = item.current_version
+        if version.price != cart_item.unit_price:
+            version = MenuItemVersion.objects.create(menuitem=item, title=item.title, price=cart_item.unit_price, category_id=item.category_id)
+        Cart.objects.filter(pk=cart_item.pk).update(menuitem_version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0010_menuitem_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='menuitem_version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LittleLemonAPI.menuitemversion'),
+        ),
+        migrations.RunPython(set_cart_versions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cart',
+            name='menuitem_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LittleLemonAPI.menuitemversion'),
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+import hashlib
+import secrets
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -11,18 +17,104 @@ class Category(models.Model):
     def __str__(self):
         return self.title
     
+class ActiveMenuItemManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active = True)
+
+#Deleting a menu item only clears is_active, see menu_purge.py. MenuItem.objects
+#leaves deleted items out, the default manager all_objects and related rows
+#still reach them.
 class MenuItem(models.Model):
+    VERSIONED_FIELDS = ['title', 'price', 'category_id']
+
     title = models.CharField(max_length=255, db_index=True)
     price = models.DecimalField(max_digits = 6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True, default = False)
     category= models.ForeignKey(Category, on_delete = models.PROTECT)
-    
+    is_active = models.BooleanField(db_index = True, default = True)
+    deleted_at = models.DateTimeField(null = True, blank = True)
+    current_version = models.ForeignKey('MenuItemVersion', on_delete = models.SET_NULL, null = True, blank = True, related_name = "+")
+
+    objects = ActiveMenuItemManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        #dumpdata, model forms and the admin have to reach deleted items that
+        #order lines still point at
+        default_manager_name = 'all_objects'
+
     def __str__(self):
         return self.title
+
+    def version_is_current(self) -> bool:
+        version = self.current_version
+        if version is None:
+            return False
+        for name in self.VERSIONED_FIELDS:
+            field = self._meta.get_field(name)
+            if field.to_python(getattr(version, name)) != field.to_python(getattr(self, name)):
+                return False
+        return True
+
+    def save(self, *args, **kwargs):
+        #deleted_at follows is_active when it is changed by hand, e.g. in the admin
+        if self.is_active:
+            self.deleted_at = None
+        elif self.deleted_at is None:
+            self.deleted_at = timezone.now()
+        #a new version is recorded whenever a versioned field changes
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.version_is_current():
+                self.current_version = MenuItemVersion.objects.create(
+                    menuitem = self, title = self.title, price = self.price, category_id = self.category_id
+                )
+                MenuItem.all_objects.filter(pk = self.pk).update(current_version = self.current_version)
+
+class MenuItemVersionManager(models.Manager):
+    def create_missing(self, menuitem_ids = None) -> int:
+        """
+        Records a first version for menu items that have none, e.g. because
+        they were created by bulk_create. Only current_version is written, so
+        concurrent edits and deletes of the items are kept and no post_save
+        is sent.
+        """
+        items = MenuItem.all_objects.filter(current_version__isnull = True)
+        if menuitem_ids is not None:
+            items = items.filter(pk__in = menuitem_ids)
+        with transaction.atomic():
+            #locked so that concurrent callers cannot version an item twice
+            rows = list(items.select_for_update().values_list('pk', 'title', 'price', 'category_id'))
+            if not rows:
+                return 0
+            self.bulk_create([
+                MenuItemVersion(menuitem_id = pk, title = title, price = price, category_id = category_id)
+                for pk, title, price, category_id in rows
+            ])
+            latest = self.filter(menuitem = OuterRef('pk')).order_by('-pk').values('pk')[:1]
+            MenuItem.all_objects.filter(pk__in = [row[0] for row in rows]).update(current_version = Subquery(latest))
+        return len(rows)
+
+#Immutable copy of a menu item as it was ordered. Cart rows and order lines
+#point at the version, so later edits and deletes of the item do not change
+#what was ordered.
+class MenuItemVersion(models.Model):
+    menuitem = models.ForeignKey(MenuItem, on_delete = models.CASCADE, related_name = "versions")
+    title = models.CharField(max_length = 255)
+    price = models.DecimalField(max_digits = 6, decimal_places = 2)
+    category = models.ForeignKey(Category, on_delete = models.PROTECT, related_name = "+")
+    created = models.DateTimeField(auto_now_add = True)
+
+    objects = MenuItemVersionManager()
+
+    def __str__(self):
+        return self.title + " (" + str(self.created) + ")"
     
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete = models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    #the version unit_price was taken from, checkout copies it to the order line
+    menuitem_version = models.ForeignKey(MenuItemVersion, on_delete = models.CASCADE, related_name = "+")
     quantity = models.SmallIntegerField(default = 1)
     unit_price = models.DecimalField(max_digits=6, decimal_places = 2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
@@ -32,7 +124,18 @@ class Cart(models.Model):
         
     def __str__(self):
         return self.user.username + "'s Cart"
-        
+
+#Running totals of a user's Cart rows, kept up to date by cart.py. version
+#changes on every cart write and keys the cached cart listing.
+class CartSummary(models.Model):
+    user = models.OneToOneField(User, on_delete = models.CASCADE, primary_key = True, related_name = "cart_summary")
+    item_count = models.PositiveIntegerField(default = 0)
+    total = models.DecimalField(max_digits = 8, decimal_places = 2, default = 0)
+    version = models.PositiveIntegerField(default = 0)
+
+    def __str__(self):
+        return self.user.username + "'s Cart Summary"
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete = models.CASCADE)
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name = "delivery_crew", null = True)
@@ -45,12 +148,122 @@ class Order(models.Model):
     
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
-    menuitem = models.ForeignKey(MenuItem, on_delete = models.CASCADE)
+    #order history keeps its menu items, they can only be soft-deleted
+    menuitem = models.ForeignKey(MenuItem, on_delete = models.PROTECT)
+    menuitem_version = models.ForeignKey(MenuItemVersion, on_delete = models.PROTECT, null = True)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places = 2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     
     class Meta:
         unique_together = ('order', 'menuitem')
+
+#Archive tables for delivered orders older than ORDER_ARCHIVE_DAYS, see archive.py.
+#ArchivedOrder keeps the original order id and the same column order as Order
+#so both tables can be combined with a UNION.
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = "archived_orders")
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name = "archived_deliveries", null = True)
+    status = models.BooleanField(default = True)
+    total = models.DecimalField(max_digits = 6, decimal_places= 2)
+    date= models.DateField(db_index=True)
+
+    def __str__(self):
+        return "ID: " + str(self.pk) + ", Date: " + str(self.date) + " (archived)"
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE)
+    menuitem = models.ForeignKey(MenuItem, on_delete = models.PROTECT)
+    menuitem_version = models.ForeignKey(MenuItemVersion, on_delete = models.PROTECT, null = True, related_name = "archived_orderitem_set")
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places = 2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        unique_together = ('order', 'menuitem')
+
     
-    
\ No newline at end of file
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.SmallIntegerField(null=True)
+    response_body = models.TextField(blank=True, default='')
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return self.user.username + ": " + self.key
+
+class AuthTokenManager(models.Manager):
+    def issue(self, user):
+        for _ in range(5):
+            key = secrets.token_hex(AuthToken.KEY_LENGTH // 2)
+            try:
+                with transaction.atomic():
+                    token = self.create(
+                        user=user,
+                        prefix=key[:AuthToken.PREFIX_LENGTH],
+                        digest=AuthToken.hash_key(key),
+                        expires_at=timezone.now() + AuthToken.get_ttl(),
+                    )
+            except IntegrityError:
+                #prefix collision, try another key
+                continue
+            #the raw key is only available on the instance that issued it
+            token.key = key
+            return token
+        raise IntegrityError("Could not issue a unique token prefix.")
+
+    def get_or_create(self, user, **kwargs):
+        #djoser's login_user calls get_or_create(user=user). Raw keys are never
+        #stored, so every login issues a fresh token.
+        return self.issue(user), True
+
+class AuthToken(models.Model):
+    PREFIX_LENGTH = 10
+    KEY_LENGTH = 40
+
+    prefix = models.CharField(max_length=PREFIX_LENGTH, unique=True)
+    digest = models.CharField(max_length=64)
+    user = models.ForeignKey(User, related_name='auth_tokens', on_delete=models.CASCADE)
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = AuthTokenManager()
+
+    @staticmethod
+    def hash_key(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def get_ttl() -> timedelta:
+        return timedelta(seconds=settings.EXPIRING_TOKEN['TTL'])
+
+    def __str__(self):
+        return self.user.username + ": " + self.prefix
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.SmallIntegerField(default=0)
+    max_attempts = models.SmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return self.name + " (" + self.status + ")"
@@ -1,8 +1,15 @@
 from rest_framework.permissions import BasePermission
 
+def in_group(user, name: str) -> bool:
+    #CachedTokenAuthentication resolves the group names along with the user
+    group_names = getattr(user, '_cached_group_names', None)
+    if group_names is not None:
+        return name in group_names
+    return user.groups.filter(name=name).exists()
+
 class IsManager(BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.groups.filter(name='Manager').exists()
+        return bool(request.user) and in_group(request.user, 'Manager')
     
 class IsAdminOrManager(BasePermission):
 
@@ -10,7 +17,7 @@ class IsAdminOrManager(BasePermission):
         if request.user and request.user.is_superuser:
             return True
         
-        if request.user and request.user.groups.filter(name='Manager').exists():
+        if request.user and in_group(request.user, 'Manager'):
             return True
         
         return False
\ No newline at end of file
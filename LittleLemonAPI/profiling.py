@@ -0,0 +1,184 @@
+import cProfile
+import os
+import pstats
+import socket
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+SIGNING_SALT = 'LittleLemonAPI.profiling'
+HEADER_VALUE = 'profile'
+
+def get_config(name: str):
+    return settings.PROFILER[name]
+
+def worker_id() -> str:
+    #read per call, the module can be imported before a preforking server forks
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def make_profile_header() -> str:
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(HEADER_VALUE)
+
+def has_valid_profile_header(request) -> bool:
+    value = request.headers.get(get_config('HEADER'))
+    if not value:
+        return False
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=get_config('HEADER_MAX_AGE')) == HEADER_VALUE
+    except signing.BadSignature:
+        return False
+
+
+class ProfileWindow:
+    """
+    cProfile stats of the sampled requests, aggregated over WINDOW seconds.
+    When a window ends it becomes the previous window and a new one starts.
+    Windows are kept per process, each worker only sees its own requests.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self.start_window(time.time())
+        self.previous = None
+
+    def start_window(self, now):
+        self.started = now
+        self.stats = None
+        self.samples = defaultdict(int)
+
+    def rotate(self, now):
+        if now - self.started >= get_config('WINDOW'):
+            self.previous = (self.started, self.stats, dict(self.samples))
+            self.start_window(now)
+
+    def should_sample(self, view_name: str) -> bool:
+        rate = get_config('SAMPLE_RATES').get(view_name, get_config('SAMPLE_RATE'))
+        if not rate:
+            return False
+        #plain counter per view, no locking, an off-by-one sample is harmless
+        self._counters[view_name] += 1
+        return self._counters[view_name] % rate == 0
+
+    def add(self, view_name: str, profiler: cProfile.Profile):
+        with self._lock:
+            self.rotate(time.time())
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.samples[view_name] += 1
+
+    def snapshot(self, previous: bool = False):
+        with self._lock:
+            self.rotate(time.time())
+            if previous:
+                return self.previous or (None, None, {})
+            return (self.started, self.stats, dict(self.samples))
+
+
+window = ProfileWindow()
+
+#Python 3.12+ allows one active profiler per interpreter, so sampled requests
+#take turns and the ones that find it busy run unprofiled
+profiler_lock = threading.Lock()
+
+def function_label(func) -> str:
+    filename, line, name = func
+    return f"{filename}:{line}({name})" if line else name
+
+def top_functions(stats: pstats.Stats, sort: str = 'cumulative', limit: int = 30) -> list:
+    if stats is None:
+        return []
+    key = 3 if sort == 'cumulative' else 2
+    rows = sorted(stats.stats.items(), key=lambda entry: entry[1][key], reverse=True)[:limit]
+    return [
+        {'function': function_label(func), 'ncalls': nc, 'tottime': round(tt, 6), 'cumtime': round(ct, 6)}
+        for func, (cc, nc, tt, ct, callers) in rows
+    ]
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 64, min_fraction: float = 0.001) -> str:
+    """
+    Rebuilds flamegraph.pl/speedscope "collapsed" stacks from the caller
+    edges cProfile records. cProfile keeps no full stacks, so time below a
+    function reached through several callers is split in proportion to
+    each caller's share. Paths worth less than min_fraction of the total
+    time are dropped, otherwise the number of paths can explode.
+    """
+    if stats is None:
+        return ''
+    callees = defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge))
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+    cutoff = sum(stats.stats[root][3] for root in roots) * min_fraction
+
+    totals = defaultdict(float)
+
+    def walk(func, stack, self_time, share):
+        stack = stack + [function_label(func)]
+        if self_time > 0:
+            totals[';'.join(stack)] += self_time
+        if len(stack) >= max_depth:
+            return
+        for callee, (edge_cc, edge_nc, edge_tt, edge_ct) in callees[func]:
+            callee_ct = stats.stats[callee][3]
+            if share * edge_ct < cutoff or not callee_ct or function_label(callee) in stack:
+                continue
+            walk(callee, stack, edge_tt * share, share * edge_ct / callee_ct)
+
+    for root in roots:
+        if stats.stats[root][3] >= cutoff:
+            walk(root, [], stats.stats[root][2], 1.0)
+
+    #flamegraph tools expect integer sample counts, use microseconds
+    return '\n'.join(f"{stack} {int(seconds * 1e6)}" for stack, seconds in sorted(totals.items()) if seconds >= 1e-6)
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles one in SAMPLE_RATE requests per view, or SAMPLE_RATES[view name],
+    plus every request carrying a valid signed profile header. Unsampled
+    requests only pay for a counter increment, and with ENABLED off the
+    middleware removes itself at startup.
+    """
+    def __init__(self, get_response):
+        if not get_config('ENABLED'):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if not (window.should_sample(view_name) or has_valid_profile_header(request)):
+            return None
+
+        def run_view():
+            response = view_func(request, *view_args, **view_kwargs)
+            #DRF responses are rendered lazily, render inside the profile
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return response
+
+        if not profiler_lock.acquire(blocking=False):
+            return None
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                #another profiling tool, e.g. a debugger or coverage, is active
+                return None
+            try:
+                response = run_view()
+            finally:
+                profiler.disable()
+        finally:
+            profiler_lock.release()
+        window.add(view_name, profiler)
+        return response
@@ -0,0 +1,78 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COLUMNAR_MEDIA_TYPE = 'application/vnd.littlelemon.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+def to_columns(data):
+    """
+    Turns a list of objects sharing the same keys into
+    {"columns": [...], "rows": [[...], ...]} so the keys are sent once.
+    Anything else is returned unchanged.
+    """
+    if not isinstance(data, list) or not data or not all(isinstance(row, dict) for row in data):
+        return data
+    columns = list(data[0].keys())
+    if any(list(row.keys()) != columns for row in data):
+        return data
+    return {'columns': columns, 'rows': [list(row.values()) for row in data]}
+
+def from_columns(data):
+    if isinstance(data, dict) and set(data.keys()) == {'columns', 'rows'}:
+        return [dict(zip(data['columns'], row)) for row in data['rows']]
+    return data
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = COLUMNAR_MEDIA_TYPE
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columns(data), accepted_media_type, renderer_context)
+
+class ColumnarJSONParser(JSONParser):
+    media_type = COLUMNAR_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return from_columns(super().parse(stream, media_type, parser_context))
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        #Decimal, dates and lazy strings are encoded the same way as in JSON responses
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+
+class LazyBrowsableAPIRenderer(BrowsableAPIRenderer):
+    """
+    Browsable API without the generated HTML forms. Building those forms
+    evaluates the queryset of every related field, e.g. all categories for
+    category_id, on each page view. The raw data form is still offered for
+    POST, PUT and PATCH.
+    """
+
+    def get_rendered_html_form(self, data, view, method, request):
+        return None
@@ -0,0 +1,15 @@
+from django.db.models import Q
+from .permissions import in_group
+
+def order_scope(user, write: bool = False) -> Q:
+    """
+    Turns the caller's role into a filter for Order and ArchivedOrder, so
+    authorization happens in the same query as the fetch. Managers and
+    admins see every order. Everyone else can read the orders they placed or
+    are assigned to deliver, and can only update the ones they deliver.
+    """
+    if user.is_superuser or in_group(user, 'Manager'):
+        return Q()
+    if write:
+        return Q(delivery_crew=user)
+    return Q(user=user) | Q(delivery_crew=user)
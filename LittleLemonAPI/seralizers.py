@@ -2,8 +2,12 @@ from django.utils.text import slugify
 from django.contrib.auth.models import User, Group
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-import bleach
-from .models import MenuItem, Category, Cart, Order, OrderItem
+from .models import MenuItem, Category, Cart, CartSummary, Order, OrderItem
+
+def clean_html(value: str) -> str:
+    #bleach pulls in html5lib, it is imported on first use instead of at worker start
+    import bleach
+    return bleach.clean(value)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,8 +19,8 @@ class CategorySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Slug field cannot be empty')
         if(not titleInput or titleInput == ""):
             raise serializers.ValidationError('Title field cannot be empty')
-        titleInput = bleach.clean(titleInput)
-        slugInput = slugify(bleach.clean(slugInput))
+        titleInput = clean_html(titleInput)
+        slugInput = slugify(clean_html(slugInput))
         return attrs
     
     class Meta:
@@ -32,7 +36,7 @@ class MenuItemSerializer(serializers.ModelSerializer):
     def validate_title(self,value):
         if not value or value =="":
             raise serializers.ValidationError("Title cannot be empty")
-        return bleach.clean(value)
+        return clean_html(value)
     
     class Meta:
         model = MenuItem
@@ -58,28 +62,12 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['menuitem', 'menuitem_id', 'quantity', 'unit_price', 'price']
 
-    def create(self, validated_data):
-        user = self.context['request'].user
-        menuitem = validated_data['menuitem']
-        quantity = validated_data['quantity']
-        unit_price = menuitem.price
-        price = unit_price * quantity
-
-        # Check if the item already exists in the cart for this user
-        cart_item, created = Cart.objects.get_or_create(user=user, menuitem=menuitem, unit_price = unit_price, price = price, quantity=quantity)
-
-        if not created:
-            # If item already exists, update the quantity
-            cart_item.quantity += quantity
-            cart_item.price += price
-        else:
-            # If new item, set initial values
-            cart_item.quantity = quantity
-            cart_item.unit_price = unit_price
-            cart_item.price = price
-
-        cart_item.save()
-        return cart_item
+#read-only, CartSummary rows are written by cart.py
+class CartSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CartSummary
+        fields = ['item_count', 'total']
+        read_only_fields = ['item_count', 'total']
         
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -89,7 +77,7 @@ class UserSerializer(serializers.ModelSerializer):
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
-        fields = ['menuitem', 'quantity', 'unit_price', 'price']
+        fields = ['menuitem', 'menuitem_version', 'quantity', 'unit_price', 'price']
         
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
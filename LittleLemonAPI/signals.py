@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User, Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import authentication, cart, sqlite
+from .menu_snapshot import schedule_publish
+from .models import AuthToken, MenuItem, Category, Cart
+
+#Token authentication cache invalidation
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.invalidate_token(f"{authentication.CachedTokenAuthentication.cache_namespace}:{instance.key}", instance.user_id)
+
+@receiver(post_delete, sender=AuthToken)
+def auth_token_deleted(sender, instance, **kwargs):
+    authentication.invalidate_token(f"{authentication.ExpiringTokenAuthentication.cache_namespace}:{instance.prefix}", instance.user_id)
+
+@receiver(user_logged_out)
+def user_logged_out_handler(sender, user, **kwargs):
+    if user is not None:
+        authentication.invalidate_user(user.pk)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.pk)
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    authentication.invalidate_all()
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        authentication.invalidate_user(instance.pk)
+    elif pk_set is None:
+        authentication.invalidate_all()
+    else:
+        for user_id in pk_set:
+            authentication.invalidate_user(user_id)
+
+#Menu snapshot publishing
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def menu_changed(sender, instance, **kwargs):
+    schedule_publish()
+    #cached cart listings embed the menu items
+    cart.invalidate_listings()
+
+#Cart summaries
+@receiver(pre_delete, sender=MenuItem)
+def menu_item_deleting(sender, instance, **kwargs):
+    #the cascade removes Cart rows without going through cart.py
+    user_ids = list(Cart.objects.filter(menuitem=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: cart.rebuild_summaries(user_ids))
+
+#SQLite deployment profile
+connection_created.connect(sqlite.apply_pragmas)
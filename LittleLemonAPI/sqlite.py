@@ -0,0 +1,14 @@
+from django.conf import settings
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Applies SQLITE_PRAGMAS to every new SQLite connection. WAL lets readers
+    carry on while one writer commits, synchronous=NORMAL only syncs at
+    checkpoints in WAL mode, and busy_timeout makes a writer wait for the
+    lock instead of failing with "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
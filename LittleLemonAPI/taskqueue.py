@@ -0,0 +1,133 @@
+import functools
+import json
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import Q, F
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+def get_config(name: str):
+    return settings.TASK_QUEUE[name]
+
+def task(max_attempts: int = 3, coalesce: bool = False):
+    """
+    Registers a function as a task. Tasks take JSON-serializable keyword
+    arguments and may be retried, so they have to be safe to run twice.
+
+    With coalesce, a claimed task also stands in for the identical tasks
+    still pending. Their work was committed before the claim, so the run
+    sees it, and anything committed later comes with a task of its own.
+    """
+    def register(func):
+        func.task_name = func.__name__
+        func.max_attempts = max_attempts
+        func.coalesce = coalesce
+        TASKS[func.task_name] = func
+        return func
+    return register
+
+def enqueue(func, **payload):
+    """
+    Inserts the task row in the current transaction, so it is committed or
+    rolled back together with the work that caused it, and a worker cannot
+    claim it before that work is visible. With TASK_QUEUE['EAGER'] the task
+    runs in-process once the transaction commits instead.
+    """
+    if get_config('EAGER'):
+        #coalescing tasks run once per transaction
+        pending = (callback[1] for callback in transaction.get_connection().run_on_commit)
+        if func.coalesce and any(isinstance(callback, functools.partial) and callback.args == (func, payload) for callback in pending):
+            return None
+        transaction.on_commit(functools.partial(run_eager, func, payload))
+        return None
+    return Task.objects.create(name=func.task_name, payload=payload, max_attempts=func.max_attempts, run_at=timezone.now())
+
+def run_eager(func, payload):
+    try:
+        func(**payload)
+    except Exception:
+        logger.exception("Task %s failed", func.task_name)
+
+def claim_batch(batch_size: int) -> list:
+    """
+    Claims up to batch_size due tasks. Rows locked by another worker are
+    skipped rather than waited on, and running tasks whose lease ran out,
+    e.g. because their worker died, are claimed again until they are out of
+    attempts. Then they are marked failed, a task that keeps killing its
+    worker is not retried forever.
+    """
+    now = timezone.now()
+    expired = Q(status=Task.RUNNING, locked_until__lt=now)
+    with transaction.atomic():
+        Task.objects.filter(expired, attempts__gte=F('max_attempts')).update(
+            status=Task.FAILED, locked_until=None, last_error='Lease expired on the last attempt.'
+        )
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Task.PENDING, run_at__lte=now) | expired & Q(attempts__lt=F('max_attempts')))
+            .order_by('run_at')[:batch_size]
+        )
+        tasks = coalesce(tasks)
+        Task.objects.filter(pk__in=[claimed.pk for claimed in tasks]).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1, locked_until=now + timedelta(seconds=get_config('LEASE'))
+        )
+    for claimed in tasks:
+        claimed.attempts += 1
+    return tasks
+
+def coalesce(tasks: list) -> list:
+    """
+    Keeps one claimed task per coalescing (name, payload) and deletes the
+    other pending copies, those claimed in the same batch included. Copies
+    locked by another worker are left to it.
+    """
+    kept = []
+    seen = set()
+    for claimed in tasks:
+        func = TASKS.get(claimed.name)
+        if func is None or not func.coalesce:
+            kept.append(claimed)
+            continue
+        identity = (claimed.name, json.dumps(claimed.payload, sort_keys=True))
+        if identity in seen:
+            continue
+        seen.add(identity)
+        kept.append(claimed)
+        copies = (
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(name=claimed.name, payload=claimed.payload, status=Task.PENDING)
+            .exclude(pk=claimed.pk)
+        )
+        Task.objects.filter(pk__in=list(copies.values_list('pk', flat=True))).delete()
+    return kept
+
+def run_task(claimed: Task):
+    close_old_connections()
+    try:
+        func = TASKS.get(claimed.name)
+        if func is None:
+            raise LookupError(f"Unknown task {claimed.name}")
+        func(**claimed.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            #back off exponentially between attempts
+            retry_at = timezone.now() + timedelta(seconds=get_config('RETRY_DELAY') * 2 ** (claimed.attempts - 1))
+            Task.objects.filter(pk=claimed.pk).update(status=Task.PENDING, run_at=retry_at, locked_until=None, last_error=error)
+        else:
+            Task.objects.filter(pk=claimed.pk).update(status=Task.FAILED, locked_until=None, last_error=error)
+        logger.warning("Task %s (%s) failed on attempt %s", claimed.name, claimed.pk, claimed.attempts)
+        return False
+    else:
+        #finished tasks are deleted to keep the queue table small
+        Task.objects.filter(pk=claimed.pk).delete()
+        return True
+    finally:
+        close_old_connections()
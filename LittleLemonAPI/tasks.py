@@ -0,0 +1,41 @@
+from django.core.mail import send_mail
+from .menu_purge import purge_cart_rows
+from .models import Order
+from .taskqueue import task
+
+@task()
+def send_order_receipt(order_id: int):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    items = order.orderitem_set.select_related('menuitem', 'menuitem_version')
+    #the version holds the title the item had when it was ordered
+    lines = [f"{item.quantity} x {(item.menuitem_version or item.menuitem).title}: {item.price}" for item in items]
+    send_mail(
+        f"Little Lemon order #{order.pk}",
+        "\n".join(lines + [f"Total: {order.total}"]),
+        None, [order.user.email],
+    )
+
+@task()
+def notify_delivery_crew(order_id: int):
+    order = Order.objects.select_related('delivery_crew').filter(pk=order_id).first()
+    if order is None or order.delivery_crew is None or not order.delivery_crew.email:
+        return
+    send_mail(
+        f"Order #{order.pk} assigned to you",
+        f"Order #{order.pk} from {order.date} is ready for delivery.",
+        None, [order.delivery_crew.email],
+    )
+
+@task()
+def notify_order_status(order_id: int):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    state = "delivered" if order.status else "out for delivery"
+    send_mail(f"Order #{order.pk} is {state}", f"Your order #{order.pk} is {state}.", None, [order.user.email])
+
+@task()
+def purge_deleted_menu_item(menuitem_id: int):
+    purge_cart_rows([menuitem_id])
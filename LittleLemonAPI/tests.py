@@ -1,3 +1,539 @@
-from django.test import TestCase
+import threading
+import time
+from io import StringIO
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.forms import modelform_factory
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from . import authentication, cart
+from .archive import archive_batch, archive_horizon
+from .menu_snapshot import publish_menu_snapshot
+from .taskqueue import claim_batch, enqueue, run_task, task
+from .models import AuthToken, Category, MenuItem, MenuItemVersion, Cart, Order, OrderItem, IdempotencyKey, ArchivedOrder, ArchivedOrderItem, Task
 
-# Create your tests here.
+#tasks are queued rather than run eagerly, so tests can look at the Task rows
+#and menu changes do not publish snapshots
+queued_tasks = override_settings(TASK_QUEUE=dict(settings.TASK_QUEUE, EAGER=False))
+
+@task(max_attempts=2)
+def failing_test_task():
+    raise RuntimeError('boom')
+
+@task()
+def noop_test_task():
+    pass
+
+
+@queued_tasks
+class LittleLemonTestCase(APITestCase):
+    def setUp(self):
+        #throttle counters and cached token lookups must not leak between tests
+        cache.clear()
+        authentication.invalidate_all()
+        self.category = Category.objects.create(slug='mains', title='Mains')
+        self.item = MenuItem.objects.create(title='Pasta', price='9.50', category=self.category)
+
+    def make_user(self, username: str, group: str = None) -> User:
+        user = User.objects.create_user(username=username, password='lemon@123!')
+        if group:
+            user.groups.add(Group.objects.get_or_create(name=group)[0])
+        return user
+
+    def authenticate(self, user: User) -> AuthToken:
+        token = AuthToken.objects.issue(user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        return token
+
+
+class IdempotencyTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('jenny')
+        self.authenticate(self.user)
+
+    def add_to_cart(self, key: str, quantity: int = 1):
+        return self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk, 'quantity': quantity}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.add_to_cart('add-pasta')
+        retry = self.add_to_cart('add-pasta')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+
+    def test_same_key_with_a_different_body_is_rejected(self):
+        self.add_to_cart('add-pasta')
+        response = self.add_to_cart('add-pasta', quantity=3)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+
+    def test_checkout_retry_creates_one_order(self):
+        self.add_to_cart('add-pasta')
+        first = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='checkout')
+        retry = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='checkout')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.add_to_cart('shared-key')
+        self.authenticate(self.make_user('semiramis'))
+        response = self.add_to_cart('shared-key', quantity=2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.filter(key='shared-key').count(), 2)
+
+    def test_requests_without_a_key_are_not_stored(self):
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk, 'quantity': 1}, format='json')
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk, 'quantity': 1}, format='json')
+
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@queued_tasks
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a test database that several connections can share')
+        cache.clear()
+        authentication.invalidate_all()
+        category = Category.objects.create(slug='mains', title='Mains')
+        self.item = MenuItem.objects.create(title='Pasta', price='9.50', category=category)
+        self.user = User.objects.create_user(username='jenny', password='lemon@123!')
+        self.token = AuthToken.objects.issue(self.user)
+
+    def test_concurrent_duplicates_run_the_view_once(self):
+        barrier = threading.Barrier(2)
+        responses = []
+
+        def slow_add_item(*args, **kwargs):
+            #keeps the first request inside its transaction while the second arrives
+            time.sleep(0.5)
+            return cart.add_item(*args, **kwargs)
+
+        def post():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+            barrier.wait()
+            try:
+                responses.append(client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk, 'quantity': 1}, format='json', HTTP_IDEMPOTENCY_KEY='add-pasta'))
+            finally:
+                connection.close()
+
+        with mock.patch('LittleLemonAPI.views.add_item', side_effect=slow_add_item):
+            threads = [threading.Thread(target=post) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_201_CREATED] * 2)
+        self.assertEqual(sorted(response.has_header('Idempotent-Replayed') for response in responses), [False, True])
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+
+class AuthTokenTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('jenny')
+
+    def get_cart(self, key: str):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        return self.client.get('/api/cart/menu-items')
+
+    def test_valid_token_is_accepted_and_stored_hashed(self):
+        token = AuthToken.objects.issue(self.user)
+
+        self.assertEqual(self.get_cart(token.key).status_code, status.HTTP_200_OK)
+        stored = AuthToken.objects.get(pk=token.pk)
+        self.assertEqual(stored.prefix, token.key[:AuthToken.PREFIX_LENGTH])
+        self.assertEqual(stored.digest, AuthToken.hash_key(token.key))
+        self.assertNotIn(token.key, (stored.prefix, stored.digest))
+
+    def test_expired_token_is_rejected(self):
+        token = AuthToken.objects.issue(self.user)
+        AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.get_cart(token.key)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['detail'], 'Token has expired.')
+
+    def test_expiry_slides_once_less_than_half_the_ttl_is_left(self):
+        token = AuthToken.objects.issue(self.user)
+        ttl = AuthToken.get_ttl()
+        AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() + ttl / 4)
+
+        self.assertEqual(self.get_cart(token.key).status_code, status.HTTP_200_OK)
+        self.assertGreater(AuthToken.objects.get(pk=token.pk).expires_at, timezone.now() + ttl * 3 / 4)
+
+    def test_expiry_is_not_written_while_more_than_half_is_left(self):
+        token = AuthToken.objects.issue(self.user)
+        expires_at = AuthToken.objects.get(pk=token.pk).expires_at
+
+        self.get_cart(token.key)
+        self.assertEqual(AuthToken.objects.get(pk=token.pk).expires_at, expires_at)
+
+    def test_wrong_digest_is_rejected(self):
+        token = AuthToken.objects.issue(self.user)
+        #right prefix, wrong secret part
+        forged = token.key[:AuthToken.PREFIX_LENGTH] + '0' * (AuthToken.KEY_LENGTH - AuthToken.PREFIX_LENGTH)
+        if forged == token.key:
+            forged = forged[:-1] + '1'
+
+        self.assertEqual(self.get_cart(token.key).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_cart(forged).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_cart(token.key[:-1]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logged_out_token_is_rejected(self):
+        response = self.client.post('/auth/token/login/', {'username': 'jenny', 'password': 'lemon@123!'}, format='json')
+        key = response.json()['auth_token']
+        self.assertEqual(self.get_cart(key).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.post('/auth/token/logout/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_cart(key).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+    def test_deactivated_user_is_rejected_with_a_cached_token(self):
+        token = AuthToken.objects.issue(self.user)
+        self.assertEqual(self.get_cart(token.key).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_cart(token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class OrderScopeTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.make_user('jenny')
+        self.other_customer = self.make_user('semiramis')
+        self.crew = self.make_user('rafael', 'DeliveryCrew')
+        self.other_crew = self.make_user('mario', 'DeliveryCrew')
+        self.manager = self.make_user('adrian', 'Manager')
+        self.order = Order.objects.create(user=self.customer, delivery_crew=self.crew, total='9.50', date=date.today())
+        self.other_order = Order.objects.create(user=self.other_customer, delivery_crew=self.other_crew, total='19.00', date=date.today())
+
+    def list_ids(self, user: User) -> set:
+        self.authenticate(user)
+        response = self.client.get('/api/orders')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {order['id'] for order in response.json()}
+
+    def test_list_is_scoped_by_role(self):
+        self.assertEqual(self.list_ids(self.customer), {self.order.pk})
+        self.assertEqual(self.list_ids(self.crew), {self.order.pk})
+        self.assertEqual(self.list_ids(self.manager), {self.order.pk, self.other_order.pk})
+
+    def test_detail_is_scoped_by_role(self):
+        #the detail view used to crash on request.User for every caller
+        for user in (self.customer, self.crew, self.manager):
+            self.authenticate(user)
+            response = self.client.get(f'/api/orders/{self.order.pk}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK, user.username)
+            self.assertEqual(response.json()['id'], self.order.pk)
+
+        for user in (self.customer, self.crew):
+            self.authenticate(user)
+            response = self.client.get(f'/api/orders/{self.other_order.pk}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, user.username)
+
+    def test_detail_falls_back_to_the_archive(self):
+        archived = ArchivedOrder.objects.create(id=self.other_order.pk + 100, user=self.customer, total='5.00', date=date(2020, 1, 1))
+        self.authenticate(self.customer)
+        self.assertEqual(self.client.get(f'/api/orders/{archived.pk}').json()['id'], archived.pk)
+
+    def test_delivery_crew_can_only_update_their_own_orders(self):
+        self.authenticate(self.crew)
+        response = self.client.patch(f'/api/orders/{self.order.pk}', {'status': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Order.objects.get(pk=self.order.pk).status)
+
+        response = self.client.patch(f'/api/orders/{self.other_order.pk}', {'status': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Order.objects.get(pk=self.other_order.pk).status)
+
+    def test_delivery_crew_update_requires_status(self):
+        self.authenticate(self.crew)
+        response = self.client.patch(f'/api/orders/{self.order.pk}', {'delivery_crew': self.other_crew.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).delivery_crew, self.crew)
+
+    def test_customer_cannot_update_their_order(self):
+        self.authenticate(self.customer)
+        response = self.client.patch(f'/api/orders/{self.order.pk}', {'status': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Order.objects.get(pk=self.order.pk).status)
+
+    def test_manager_assigns_delivery_crew(self):
+        self.authenticate(self.manager)
+        response = self.client.patch(f'/api/orders/{self.order.pk}', {'delivery_crew': self.other_crew.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).delivery_crew, self.other_crew)
+
+        response = self.client.patch(f'/api/orders/{self.order.pk}', {'delivery_crew': self.customer.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_managers_delete_orders(self):
+        for user in (self.customer, self.crew):
+            self.authenticate(user)
+            response = self.client.delete(f'/api/orders/{self.order.pk}')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, user.username)
+        self.assertTrue(Order.objects.filter(pk=self.order.pk).exists())
+
+        self.authenticate(self.manager)
+        self.assertEqual(self.client.delete(f'/api/orders/{self.order.pk}').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+        self.assertEqual(self.client.delete(f'/api/orders/{self.order.pk}').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MenuItemVersionTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('jenny')
+        self.authenticate(self.user)
+
+    def add_to_cart(self, item: MenuItem, quantity: int = 1):
+        return self.client.post('/api/cart/menu-items', {'menuitem_id': item.pk, 'quantity': quantity}, format='json')
+
+    def test_order_line_records_the_version_the_cart_was_priced_from(self):
+        self.add_to_cart(self.item, 2)
+        self.item.price = '12.00'
+        self.item.save()
+
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        line = OrderItem.objects.select_related('menuitem_version').get(order_id=response.json()['id'])
+        self.assertEqual(line.menuitem_version.price, line.unit_price)
+        self.assertEqual(str(line.price), '19.00')
+        self.assertNotEqual(line.menuitem_version_id, MenuItem.objects.get(pk=self.item.pk).current_version_id)
+
+    def test_adding_again_moves_the_line_to_the_current_version(self):
+        self.add_to_cart(self.item)
+        self.item.price = '12.00'
+        self.item.save()
+        self.add_to_cart(self.item)
+
+        cart_item = Cart.objects.get(user=self.user)
+        self.assertEqual(cart_item.menuitem_version_id, self.item.current_version_id)
+        self.assertEqual(str(cart_item.price), '24.00')
+        self.assertEqual(str(self.client.get('/api/cart/menu-items?summary=true').json()['total']), '24.00')
+
+    def test_bulk_created_items_get_a_version(self):
+        self.authenticate(self.make_user('adrian', 'Manager'))
+        response = self.client.post('/api/menu-items', [
+            {'title': 'Bruschetta', 'price': '5.00', 'category_id': self.category.pk},
+            {'title': 'Tiramisu', 'price': '6.50', 'category_id': self.category.pk},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for item in MenuItem.objects.filter(title__in=['Bruschetta', 'Tiramisu']).select_related('current_version'):
+            self.assertEqual(item.current_version.price, item.price)
+        self.assertEqual(MenuItemVersion.objects.create_missing(), 0)
+
+    def test_unversioned_item_is_versioned_without_saving_it(self):
+        MenuItem.objects.bulk_create([MenuItem(title='Penne', price='8.00', category=self.category)])
+        item = MenuItem.objects.get(title='Penne')
+        self.assertIsNone(item.current_version_id)
+        Task.objects.all().delete()
+
+        #save() would send post_save, which queues a menu publish
+        self.assertEqual(self.add_to_cart(item).status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Task.objects.filter(name='publish_menu_snapshot').exists())
+        cart_item = Cart.objects.select_related('menuitem_version').get(user=self.user)
+        self.assertEqual(cart_item.menuitem_version_id, MenuItem.objects.get(pk=item.pk).current_version_id)
+        self.assertEqual(str(cart_item.menuitem_version.price), '8.00')
+
+
+class ArchiveTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.make_user('jenny')
+        self.manager = self.make_user('adrian', 'Manager')
+        old = archive_horizon() - timedelta(days=1)
+        self.delivered = self.place_order(old, delivered=True)
+        self.undelivered = self.place_order(old, delivered=False)
+        self.recent = self.place_order(date.today(), delivered=True)
+
+    def place_order(self, order_date: date, delivered: bool) -> Order:
+        order = Order.objects.create(user=self.customer, status=delivered, total='19.00', date=order_date)
+        OrderItem.objects.create(
+            order=order, menuitem=self.item, menuitem_version_id=self.item.current_version_id,
+            quantity=2, unit_price='9.50', price='19.00',
+        )
+        return order
+
+    def test_batch_moves_old_delivered_orders_with_their_items(self):
+        self.assertEqual(archive_batch(archive_horizon(), 10), 1)
+        self.assertEqual(archive_batch(archive_horizon(), 10), 0)
+
+        archived = ArchivedOrder.objects.get(pk=self.delivered.pk)
+        self.assertEqual((archived.user_id, archived.date, str(archived.total)), (self.customer.pk, self.delivered.date, '19.00'))
+        item = ArchivedOrderItem.objects.get(order=archived)
+        self.assertEqual((item.menuitem_id, item.menuitem_version_id, item.quantity, str(item.price)), (self.item.pk, self.item.current_version_id, 2, '19.00'))
+        self.assertFalse(Order.objects.filter(pk=self.delivered.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=self.delivered.pk).exists())
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {self.undelivered.pk, self.recent.pk})
+
+    def test_batch_size_limits_one_batch(self):
+        second = self.place_order(archive_horizon() - timedelta(days=2), delivered=True)
+        self.assertEqual(archive_batch(archive_horizon(), 1), 1)
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
+        self.assertEqual(archive_batch(archive_horizon(), 1), 1)
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), {self.delivered.pk, second.pk})
+
+    def test_start_date_before_the_horizon_includes_archived_orders(self):
+        archive_batch(archive_horizon(), 10)
+        self.authenticate(self.manager)
+        start_date = (archive_horizon() - timedelta(days=30)).isoformat()
+
+        recent = self.client.get('/api/orders', {'perpage': 10})
+        everything = self.client.get('/api/orders', {'perpage': 10, 'start_date': start_date})
+
+        self.assertEqual({order['id'] for order in recent.json()}, {self.undelivered.pk, self.recent.pk})
+        self.assertEqual([order['id'] for order in everything.json()], sorted([self.delivered.pk, self.undelivered.pk, self.recent.pk]))
+
+    def test_seeding_resumes_after_archiving(self):
+        options = {'users': 10, 'menu_items': 10, 'seed': 'archive', 'stdout': StringIO()}
+        call_command('seeddata', orders=30, **options)
+        self.assertGreater(archive_batch(archive_horizon(), 1000), 0)
+
+        #archived orders count as seeded, new ones get ids after the archived ones
+        call_command('seeddata', orders=40, **options)
+        seeded = {'user__username__startswith': 'seed_user_'}
+        self.assertEqual(Order.objects.filter(**seeded).count() + ArchivedOrder.objects.filter(**seeded).count(), 40)
+        self.assertFalse(Order.objects.filter(pk__in=ArchivedOrder.objects.values('pk')).exists())
+
+
+class TaskQueueTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        Task.objects.all().delete()
+
+    def run_task(self, claimed: Task) -> bool:
+        #closing the connection would end the test transaction
+        with mock.patch('LittleLemonAPI.taskqueue.close_old_connections'):
+            return run_task(claimed)
+
+    def test_claiming_a_coalescing_task_drops_its_pending_copies(self):
+        for _ in range(3):
+            enqueue(publish_menu_snapshot)
+
+        claimed = claim_batch(10)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(list(Task.objects.values_list('pk', 'status')), [(claimed[0].pk, Task.RUNNING)])
+
+    def test_change_after_the_claim_queues_another_publish(self):
+        enqueue(publish_menu_snapshot)
+        claim_batch(10)
+        #committed after the running publish read the menu
+        self.item.price = '11.00'
+        self.item.save()
+
+        self.assertEqual(Task.objects.filter(name='publish_menu_snapshot', status=Task.PENDING).count(), 1)
+        self.assertEqual(len(claim_batch(10)), 1)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        enqueue(failing_test_task)
+        claimed = claim_batch(10)[0]
+
+        self.assertFalse(self.run_task(claimed))
+        retry = Task.objects.get(pk=claimed.pk)
+        self.assertEqual((retry.status, retry.attempts), (Task.PENDING, 1))
+        self.assertIn('boom', retry.last_error)
+        self.assertGreater(retry.run_at, timezone.now())
+        self.assertEqual(claim_batch(10), [])
+
+    def test_task_is_marked_failed_after_max_attempts(self):
+        enqueue(failing_test_task)
+        for _ in range(2):
+            Task.objects.update(run_at=timezone.now())
+            self.assertFalse(self.run_task(claim_batch(10)[0]))
+
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.FAILED, 2))
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(claim_batch(10), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue(failing_test_task)
+        claimed = claim_batch(10)[0]
+        self.assertEqual(claim_batch(10), [])
+
+        #the worker died, its lease runs out
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_batch(10)
+        self.assertEqual([(entry.pk, entry.attempts) for entry in reclaimed], [(claimed.pk, 2)])
+
+    def test_expired_lease_on_the_last_attempt_fails_the_task(self):
+        enqueue(failing_test_task)
+        claim_batch(10)
+        Task.objects.update(attempts=2, locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim_batch(10), [])
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_successful_task_is_deleted(self):
+        enqueue(noop_test_task)
+        self.assertTrue(self.run_task(claim_batch(10)[0]))
+        self.assertFalse(Task.objects.exists())
+
+
+class SoftDeleteTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('jenny')
+        self.order = Order.objects.create(user=self.user, total='9.50', date=date.today())
+        self.line = OrderItem.objects.create(order=self.order, menuitem=self.item, quantity=1, unit_price='9.50', price='9.50')
+        MenuItem.objects.filter(pk=self.item.pk).update(is_active=False, deleted_at=timezone.now())
+
+    def test_dumpdata_keeps_deleted_items_that_order_lines_point_at(self):
+        out = StringIO()
+        call_command('dumpdata', 'LittleLemonAPI.menuitem', 'LittleLemonAPI.orderitem', stdout=out)
+        self.assertIn('"model": "LittleLemonAPI.menuitem", "pk": %d' % self.item.pk, out.getvalue())
+
+    def test_order_line_form_accepts_a_deleted_item(self):
+        form_class = modelform_factory(OrderItem, fields=['order', 'menuitem', 'quantity', 'unit_price', 'price'])
+        form = form_class({'order': self.order.pk, 'menuitem': self.item.pk, 'quantity': 2, 'unit_price': '9.50', 'price': '19.00'}, instance=self.line)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.client.get(f'/api/menu-items/{self.item.pk}').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout_removes_deleted_lines_and_asks_for_confirmation(self):
+        self.authenticate(self.user)
+        pizza = MenuItem.objects.get(pk=MenuItem.objects.create(title='Pizza', price='12.00', category=self.category).pk)
+        cart.add_item(self.user, MenuItem.all_objects.get(pk=self.item.pk), 1)
+        cart.add_item(self.user, pizza, 2)
+
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['removed_menuitem_ids'], [self.item.pk])
+        self.assertEqual(list(Cart.objects.filter(user=self.user).values_list('menuitem_id', flat=True)), [pizza.pk])
+        summary = self.client.get('/api/cart/menu-items?summary=true').json()
+        self.assertEqual((summary['item_count'], str(summary['total'])), (2, '24.00'))
+
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(str(response.json()['total']), '24.00')
+
+    def test_checkout_of_only_deleted_lines_empties_the_cart(self):
+        self.authenticate(self.user)
+        cart.add_item(self.user, MenuItem.all_objects.get(pk=self.item.pk), 1)
+
+        self.assertEqual(self.client.post('/api/orders').status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get('/api/cart/menu-items?summary=true').json()['item_count'], 0)
+        self.assertEqual(self.client.post('/api/orders').status_code, status.HTTP_400_BAD_REQUEST)
@@ -12,4 +12,7 @@ urlpatterns=[
     path('orders', views.OrderView.as_view()),
     path('orders/<int:pk>', views.SingleOrderView.as_view()),
     path('categories', views.CategoryView.as_view()),
+    path('menu', views.MenuSnapshotView.as_view()),
+    path('menu/<str:version>', views.MenuSnapshotView.as_view()),
+    path('profiler', views.ProfilerView.as_view()),
 ]
\ No newline at end of file
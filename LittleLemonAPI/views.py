@@ -1,7 +1,10 @@
 from datetime import date
 from django.contrib.auth.models import User, Group
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import Http404
+from django.db import transaction
+from django.http import Http404, FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.decorators import permission_classes
@@ -9,12 +12,21 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
-from .models import MenuItem, Category,Cart, Order, OrderItem
-from .seralizers import CartSerializer, CategorySerializer, MenuItemSerializer, UserSerializer, OrderSerializer
-from .permissions import IsAdminOrManager
+from .models import MenuItem, MenuItemVersion, Category,Cart, Order, OrderItem, ArchivedOrder
+from .seralizers import CartSerializer, CartSummarySerializer, CategorySerializer, MenuItemSerializer, UserSerializer, OrderSerializer
+from .permissions import IsAdminOrManager, in_group
+from .idempotency import idempotent
+from .archive import reaches_archive
+from .scoping import order_scope
+from .cart import add_item, clear_cart, get_cart_listing, get_summary, lock_summary, remove_menu_items
+from .taskqueue import enqueue
+from .tasks import send_order_receipt, notify_delivery_crew, notify_order_status, purge_deleted_menu_item
+from .menu_purge import soft_delete
+from . import profiling
+from .menu_snapshot import ENCODINGS, get_snapshot_file, publish_menu, schedule_publish
 
 def isAdminOrManager(user: User) -> bool:
-    is_admin_or_manager = user.is_superuser or user.groups.filter(name='Manager').exists()
+    is_admin_or_manager = user.is_superuser or in_group(user, 'Manager')
     return is_admin_or_manager
 
 def apply_query_param(items, request,param: str, field_name: str, lookup_expr: str = 'exact'):
@@ -81,7 +93,11 @@ class MenuItemsView(APIView):
             
             if serialized_items.is_valid():
                 if is_many:
-                    MenuItem.objects.bulk_create([MenuItem(**item) for item in serialized_items.validated_data])
+                    with transaction.atomic():
+                        MenuItem.objects.bulk_create([MenuItem(**item) for item in serialized_items.validated_data])
+                        #bulk_create neither calls save() nor sends post_save signals
+                        MenuItemVersion.objects.create_missing()
+                        schedule_publish()
                 else:
                     MenuItem.objects.create(**serialized_items.validated_data)
                 
@@ -98,7 +114,7 @@ class SingleMenuItemView(generics.RetrieveUpdateDestroyAPIView):
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
     
     def put(self, request, pk):
-        if request.user.groups.filter(name = 'Manager').exists():
+        if in_group(request.user, 'Manager'):
             try:
                 menu_item = MenuItem.objects.get(pk=pk)
             except MenuItem.DoesNotExist:
@@ -129,16 +145,53 @@ class SingleMenuItemView(generics.RetrieveUpdateDestroyAPIView):
         
     def delete(self, request, pk):
         if isAdminOrManager(request.user):
-            try:
-                menu_item = MenuItem.objects.get(pk=pk)
-            except MenuItem.DoesNotExist:
-                return Response({"message": "Menu item not found."}, status=status.HTTP_404_NOT_FOUND)
-            
-            menu_item.delete()
+            #orders keep the item, carts holding it are cleaned up by a task
+            with transaction.atomic():
+                if not soft_delete(pk):
+                    return Response({"message": "Menu item not found."}, status=status.HTTP_404_NOT_FOUND)
+                enqueue(purge_deleted_menu_item, menuitem_id = pk)
             return Response({"message": "Menu item deleted."}, status=status.HTTP_204_NO_CONTENT)
         else:
             return Response({"message": "You are not authorized to perform this action."}, status=status.HTTP_403_FORBIDDEN)
         
+#Published menu snapshot, see menu_snapshot.py
+class MenuSnapshotView(View):
+    
+    def get(self, request, version=None):
+        snapshot = get_snapshot_file(version)
+        if snapshot is None:
+            if version is not None:
+                return JsonResponse({"message": "Menu version not found."}, status=status.HTTP_404_NOT_FOUND)
+            publish_menu()
+            snapshot = get_snapshot_file()
+        
+        current_version, path = snapshot
+        etag = f'"{current_version}"'
+        if version is not None:
+            #a versioned document never changes
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = 'public, max-age=60'
+        
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+            for encoding, suffix, compress in ENCODINGS:
+                compressed = path.with_name(path.name + suffix)
+                if encoding in accept_encoding and compressed.exists():
+                    response = FileResponse(open(compressed, 'rb'), content_type='application/json')
+                    response['Content-Encoding'] = encoding
+                    break
+            else:
+                response = FileResponse(open(path, 'rb'), content_type='application/json')
+        
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        response['Content-Location'] = f"/api/menu/{current_version}"
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+        
 #User Group Management
 class ManagerUsersView(APIView):
     
@@ -253,9 +306,11 @@ class CartView(APIView):
     def get(self, request):
         try:
             user = request.user
-            cartItems = Cart.objects.filter(user=user)
-            serializer = CartSerializer(cartItems, many = True)
-            return Response(serializer.data, status = status.HTTP_200_OK)
+            #?summary=true is answered from the CartSummary row alone
+            if request.query_params.get('summary', '').lower() in ('1', 'true'):
+                serializer = CartSummarySerializer(get_summary(user))
+                return Response(serializer.data, status = status.HTTP_200_OK)
+            return Response(get_cart_listing(user), status = status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({"message": "User not found."}, status=status.HTTP_404_NOT_FOUND)
         except PermissionDenied:
@@ -263,21 +318,20 @@ class CartView(APIView):
         
         
     
+    @idempotent
     def post(self, request):
-        serializer = CartSerializer(data=request.data, context={'request': request})
+        serializer = CartSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save()  # This will call CartSerializer's create method
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            cartItem = add_item(request.user, serializer.validated_data['menuitem'], serializer.validated_data['quantity'])
+            return Response(CartSerializer(cartItem).data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     
     def delete(self, request):
         try:
-            user = request.user
-            cart_items = Cart.objects.filter(user=user)
-            cart_items.delete()
+            clear_cart(request.user)
             return Response({"message": "Cart items deleted successfully."}, status=status. HTTP_204_NO_CONTENT)
         except User.DoesNotExist:
             return Response({"message": "User not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -289,23 +343,25 @@ class OrderView(APIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
       
+    def filter_orders(self, orders, request):
+        orders = apply_query_param(orders, request, "userID", "user", "pk")
+        orders = apply_query_param(orders, request, "delivery-crew", "delivery_crew", "pk")
+        orders = apply_query_param(orders, request, "status", "status")
+        orders = apply_query_param(orders, request, "to_total", "total", "lte")
+        orders = apply_query_param(orders, request, "from_total", "total", "gte")
+        orders = apply_query_param(orders, request, "start_date", "date", "gte")
+        orders = apply_query_param(orders, request, "end_date", "date", "lte")
+        return orders
+      
     def get(self, request):
         try:
-            user = request.user
-            if isAdminOrManager(user):
-               orders =  Order.objects.all()
-            elif user.groups.filter(name = 'DeliveryCrew').exists():
-               orders = Order.objects.filter(delivery_crew = user)
-            else:
-               orders = orders = Order.objects.filter(user=user)
-               
-            orders = apply_query_param(orders, request, "userID", "user", "pk")
-            orders = apply_query_param(orders, request, "delivery-crew", "delivery-crew", "pk")
-            orders = apply_query_param(orders, request, "status", "status")
-            orders = apply_query_param(orders, request, "to_total", "total", "lte")
-            orders = apply_query_param(orders, request, "from_total", "total", "gte")
-            orders = apply_query_param(orders, request, "start_date", "date", "gte")
-            orders = apply_query_param(orders, request, "end_date", "date", "lte")
+            scope = order_scope(request.user)
+            orders = self.filter_orders(Order.objects.filter(scope), request)
+            
+            #the archive is only read when start_date reaches back past the archive horizon
+            if reaches_archive(request.query_params.get('start_date')):
+                archived = self.filter_orders(ArchivedOrder.objects.filter(scope), request)
+                orders = orders.union(archived, all = True).order_by('id')
             
             per_page = request.query_params.get('perpage', default = 5)
             paginator = Paginator(orders, per_page = per_page)
@@ -330,7 +386,8 @@ class OrderView(APIView):
         
     def get_order_item_from_cart(self, cartItem : Cart, order : Order) -> OrderItem:
         orderItem = OrderItem(
-            order = order, menuitem = cartItem.menuitem,
+            order = order, menuitem_id = cartItem.menuitem_id,
+            menuitem_version_id = cartItem.menuitem_version_id,
             quantity = cartItem.quantity,
             unit_price = cartItem.unit_price,
             price = cartItem.price
@@ -338,6 +395,7 @@ class OrderView(APIView):
         
         return orderItem
         
+    @idempotent
     def post(self, request):
         user = request.user
         cartItems = Cart.objects.filter(user= user)
@@ -346,15 +404,28 @@ class OrderView(APIView):
             return Response({'message' : "Cart is empty"}, status = status.HTTP_400_BAD_REQUEST)
         
         try:
-            total = sum(item.price for item in cartItems)
-            order = Order(user = user, total = total, date = date.today())
-            order.save()
-        
-            for item in cartItems:
-                orderItem = self.get_order_item_from_cart(item, order)
-                orderItem.save()
-        
-            cartItems.delete()
+            with transaction.atomic():
+                #holds off concurrent cart writes until the cart is cleared
+                lock_summary(user.pk)
+                cartItems = list(cartItems.select_related('menuitem'))
+                #lines of menu items deleted after they were added leave the cart, and
+                #the client confirms the new total before ordering
+                removed = [item.menuitem_id for item in cartItems if not item.menuitem.is_active]
+                if removed:
+                    remove_menu_items(user.pk, removed)
+                    return Response({
+                        'message': "Some items are no longer available and were removed from the cart.",
+                        'removed_menuitem_ids': removed,
+                    }, status = status.HTTP_409_CONFLICT)
+                total = sum(item.price for item in cartItems)
+                order = Order(user = user, total = total, date = date.today())
+                order.save()
+            
+                #one INSERT for all the lines keeps the write transaction short
+                OrderItem.objects.bulk_create([self.get_order_item_from_cart(item, order) for item in cartItems])
+            
+                clear_cart(user)
+                enqueue(send_order_receipt, order_id = order.pk)
             serializer = OrderSerializer(order)
             return Response(serializer.data, status = status.HTTP_201_CREATED)  
         except PermissionDenied:
@@ -367,31 +438,28 @@ class SingleOrderView(APIView):
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
     
     def get(self, request, pk):
-        try:
-            order = Order.objects.get(pk=pk)
-        except Order.DoesNotExist:
+        #orders the caller may not see are reported as not found
+        scope = order_scope(request.user)
+        order = Order.objects.filter(scope, pk=pk).first() or ArchivedOrder.objects.filter(scope, pk=pk).first()
+        if order is None:
             return Response({"message": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        user = request.User
-        if order.user == user or user.delivery_crew == user or isAdminOrManager(user):
-            serializer = OrderSerializer(order)
-            return Response(serializer.data, status = status.HTTP_200_OK)
-        else:
-            return Response({'message': "You are not authorized to view this order"}, status = status.HTTP_403_FORBIDDEN)
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status = status.HTTP_200_OK)
         
     def patch(self, request, pk):
+        user = request.user
         try:
-            order = Order.objects.get(pk=pk)
+            order = Order.objects.filter(order_scope(user, write = True)).get(pk=pk)
         except Order.DoesNotExist:
             return Response({"message": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        user = request.user
         if isAdminOrManager(user):
             #admin or manager can update both the status and the delivery crew
-            deliveryCrewID = int(request.data.get('delivery_crew'))
+            deliveryCrewID = request.data.get('delivery_crew')
             if not deliveryCrewID is None:
                 try:
-                    deliveryCrew = User.objects.get(pk= deliveryCrewID)
+                    deliveryCrew = User.objects.get(pk= int(deliveryCrewID))
                     name = deliveryCrew.username
                 except User.DoesNotExist:
                     return Response({"message": "User not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -405,22 +473,27 @@ class SingleOrderView(APIView):
             if not updatedStatus is None:
                 order.status = updatedStatus
                 
-            order.save()
+            with transaction.atomic():
+                order.save()
+                if deliveryCrewID is not None:
+                    enqueue(notify_delivery_crew, order_id = order.pk)
+                if updatedStatus is not None:
+                    enqueue(notify_order_status, order_id = order.pk)
             serializer = OrderSerializer(order)
             return Response(serializer.data, status = status.HTTP_200_OK)
         
-        elif user == order.delivery_crew:
+        else:
+            #the write scope only leaves the assigned delivery crew
             updatedStatus = request.data.get('status')
             if updatedStatus is None:
                 return Response({"message": "Status field is required in the request."},status=status.HTTP_400_BAD_REQUEST)
             order.status = updatedStatus
-            order.save()
+            with transaction.atomic():
+                order.save()
+                enqueue(notify_order_status, order_id = order.pk)
             serializer = OrderSerializer(order)
             return Response(serializer.data, status = status.HTTP_200_OK)
         
-        else:
-            return Response({'message': "You are not authorized to update this order"}, status = status.HTTP_403_FORBIDDEN)
-        
     def delete(self, request, pk):
         user = request.user
         
@@ -428,18 +501,37 @@ class SingleOrderView(APIView):
             return Response({'message': "You are not authorized to delete orders"}, status = status.HTTP_403_FORBIDDEN)
         
         try:
-            order = Order.objects.get(pk=pk)
+            order = Order.objects.filter(order_scope(user, write = True)).get(pk=pk)
         except Order.DoesNotExist:
-            return Response({"message": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
         
         order.delete()
         return Response({"message": "Order deleted."}, status=status.HTTP_204_NO_CONTENT)
-            
-        
-        
-        
-        
 
+#Profiling
+class ProfilerView(APIView):
+    permission_classes = [IsAdminOrManager]
+    
+    def get(self, request):
+        previous = request.query_params.get('window') == 'previous'
+        started, stats, samples = profiling.window.snapshot(previous = previous)
         
-
-        
\ No newline at end of file
+        #stats are per worker process, the response says which one answered
+        if request.query_params.get('output') == 'collapsed':
+            response = HttpResponse(profiling.collapsed_stacks(stats), content_type = 'text/plain')
+            response['X-Profile-Worker'] = profiling.worker_id()
+            return response
+        
+        try:
+            limit = int(request.query_params.get('limit', 30))
+        except ValueError:
+            limit = 30
+        sort = request.query_params.get('sort', 'cumulative')
+        return Response({
+            'enabled': profiling.get_config('ENABLED'),
+            'worker': profiling.worker_id(),
+            'window_start': started,
+            'samples': samples,
+            'top': profiling.top_functions(stats, sort = sort, limit = limit),
+            'profile_header': {profiling.get_config('HEADER'): profiling.make_profile_header()},
+        }, status = status.HTTP_200_OK)